@@ -8,17 +8,46 @@ import logging
 from pathlib import Path
 from datetime import datetime
 
-from flask import Flask, render_template, request, send_file, jsonify, flash, redirect, url_for
+import json
+import time
+from contextlib import nullcontext
+from tempfile import SpooledTemporaryFile
+
+from flask import (Flask, Request, Response, g, render_template, request, send_file, jsonify, flash,
+                   redirect, url_for, stream_with_context)
 from werkzeug.utils import secure_filename
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 from image_extractor import ImageExtractor
-from ocr_processor import OCRProcessor
+from ocr_processor import get_ocr_processor
+from ocr_engine import get_engine
+from auto_lang import AUTO, OSD_LANG
+from ocr_governor import OCRBusyError, wait_budget
 from document_processor import DocumentProcessor
+from job_queue import JobQueue, QueueFullError
+from checkpoint import document_digest
+from janitor import Janitor
+from metrics import get_metrics
+from profiler import DocumentProfile
+import text_export
 import config
 
+class SpooledRequest(Request):
+    """
+    Request that keeps uploaded documents in memory
+    
+    Uploads up to config.UPLOAD_SPOOL_MAX_BYTES are never written to disk
+    (Werkzeug's default spills anything over 500KB); larger ones spill to a
+    temporary file in config.SPOOL_DIR.
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=config.UPLOAD_SPOOL_MAX_BYTES, mode='rb+', dir=config.SPOOL_DIR)
+
+
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = SpooledRequest
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
 # Handle proxy headers for proper URL generation behind Nginx
@@ -29,6 +58,7 @@ UPLOAD_FOLDER = Path('uploads')
 OUTPUT_FOLDER = Path('outputs')
 ALLOWED_EXTENSIONS = {'docx'}
 MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB max file size
+DOCX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
@@ -45,12 +75,50 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Background job queue shared by all gunicorn workers
+job_queue = JobQueue()
+
+# Removes old uploads and outputs in the background, in one worker at a time
+janitor = Janitor([UPLOAD_FOLDER, OUTPUT_FOLDER], in_use=job_queue.active_inputs)
+
+# Counters and timings shared by all gunicorn workers, served at /metrics
+metrics = get_metrics()
+
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def get_worker_count(value) -> int:
+    """Parse a requested OCR worker count, clamped to the configured maximum"""
+    try:
+        workers = int(value)
+    except (TypeError, ValueError):
+        return config.OCR_WORKERS
+    return max(1, min(workers, config.OCR_MAX_WORKERS))
+
+
+def language_error(lang: str):
+    """
+    Error message if a requested OCR language (or part of one like 'eng+fra')
+    is not installed; None if it is, or if Tesseract itself is unavailable
+    (processing reports that). Installed languages are probed once per process.
+    """
+    try:
+        installed = get_engine().languages()
+    except Exception:
+        return None
+    if lang == AUTO:
+        if OSD_LANG not in installed:
+            return f"Automatic language selection needs the '{OSD_LANG}' language data, which is not installed"
+        return None
+    missing = [code for code in lang.split('+') if code not in installed]
+    if missing:
+        return f"OCR language not installed: {', '.join(missing)}"
+    return None
+
+
 def generate_unique_filename(original_filename):
     """Generate a unique filename to prevent overwrites"""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -59,83 +127,257 @@ def generate_unique_filename(original_filename):
     return f"{secure_filename(name)}_{timestamp}_{unique_id}{ext}"
 
 
-def process_document(input_path: str, output_path: str, text_placement: str = 'below',
-                     lang: str = 'eng', enhanced: bool = False):
+def stream_size(stream) -> int:
+    """Size in bytes of a seekable file, which is left at the start"""
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+def describe_document(document) -> str:
+    """A document path, or a placeholder for one held in memory, for log messages"""
+    return str(document) if isinstance(document, (str, Path)) else 'in-memory document'
+
+
+def iter_process_document(input_path, output_path, text_placement: str = 'below',
+                          lang: str = 'eng', enhanced: bool = False, workers: int = None,
+                          profile: DocumentProfile = None, output_format: str = text_export.DOCX,
+                          document_name: str = None, stream: bool = False):
     """
-    Process a Word document to extract text from images
+    Process a Word document, yielding progress records as work completes
     
-    Returns:
-        tuple: (success: bool, message: str, images_processed: int)
+    The input and output can each be a path or a seekable binary file (such
+    as an upload's spooled stream), so a request can be handled without the
+    document touching the disk.
+    
+    With a text output_format ('json', 'jsonl' or 'txt') only the images'
+    text and positions are written (see text_export), named after
+    document_name; the document is not rebuilt.
+    
+    If a profile is given, it receives the per-image records and the time
+    spent in each stage. With stream=True images are OCR'd in small calls
+    as they are reached, for clients that read the records as they arrive
+    (see OCRProcessor.iter_text_from_images).
+    
+    Yields:
+        dict: a 'start' record with the image count, one 'image' record per
+        image as soon as its text is known, and a final 'result' record with
+        success, message and images_processed
     """
     try:
         # Step 1: Extract images from document
-        logger.info(f"Processing document: {input_path}")
+        logger.info(f"Processing document: {describe_document(input_path)}")
+        stages = {}
         extractor = ImageExtractor(input_path)
-        images = extractor.extract_images()
+        try:
+            with metrics.timer('extract_seconds') as stages['extract']:
+                images = extractor.extract_images()
+            
+            if not images:
+                metrics.inc('documents_total', result='no_images')
+                yield {'type': 'result', 'success': False,
+                       'message': "No images found in the document", 'images_processed': 0}
+                return
         
-        if not images:
-            return False, "No images found in the document", 0
+            logger.info(f"Found {len(images)} images")
+            yield {'type': 'start', 'images': len(images)}
         
-        logger.info(f"Found {len(images)} images")
+            # Step 2: Perform OCR on each image
+            ocr_start = time.perf_counter()
+            ocr = get_ocr_processor(lang=lang)
+            # A retry after a worker timeout only OCRs the images the last attempt didn't finish
+            checkpoint = ocr.open_checkpoint(document_digest(input_path), enhanced)
+            ocr_stats = {}
+            image_texts = {}
+            try:
+                for record in ocr.iter_text_from_images(images, enhanced=enhanced, workers=workers,
+                                                        stats=ocr_stats, checkpoint=checkpoint, stream=stream):
+                    if not record['skipped']:
+                        image_texts[record['image_id']] = record['text']
+                    record_image_metrics(record)
+                    if profile is not None:
+                        profile.add_image(record)
+                    yield dict(record, type='image')
+            finally:
+                if checkpoint is not None:
+                    checkpoint.close()
+            stages['ocr'] = {'seconds': time.perf_counter() - ocr_start}
         
-        # Step 2: Perform OCR on each image
-        ocr = OCRProcessor(lang=lang)
-        image_texts = {}
-        processed_count = 0
+            processed_count = sum(1 for text in image_texts.values() if text)
+            duplicates_reused = ocr_stats['duplicates_reused']
+            skipped_non_text = ocr_stats['skipped_non_text']
         
-        for idx, img_info in enumerate(images, 1):
-            logger.info(f"Processing image {idx}/{len(images)} - {img_info.image_id}")
-            
-            pil_image = img_info.to_pil_image()
-            
-            # Check minimum image size
-            if (pil_image.width < config.MIN_IMAGE_SIZE[0] or 
-                pil_image.height < config.MIN_IMAGE_SIZE[1]):
-                logger.warning(f"Image {img_info.image_id} is too small, skipping")
-                continue
-            
-            # Extract text
-            if enhanced:
-                text = ocr.extract_text_enhanced(pil_image)
+            if output_format != text_export.DOCX:
+                # Text only: python-docx never loads or serializes the document
+                with metrics.timer('save_seconds') as stages['save']:
+                    text_export.write(output_path, output_format,
+                                      document_name or Path(describe_document(input_path)).name,
+                                      text_export.image_entries(images, image_texts))
             else:
-                text = ocr.extract_text(pil_image)
+                # Step 3: Create output document with extracted text
+                with metrics.timer('reconstruct_seconds') as stages['reconstruct']:
+                    doc_processor = DocumentProcessor(extractor.get_document(), text_placement=text_placement)
+                    modified_doc = doc_processor.add_text_to_document(image_texts, images)
             
-            image_texts[img_info.image_id] = text
-            
-            if text:
-                processed_count += 1
-                logger.info(f"Extracted {len(text)} characters from {img_info.image_id}")
-        
-        # Step 3: Create output document with extracted text
-        doc_processor = DocumentProcessor(extractor.document, text_placement=text_placement)
-        modified_doc = doc_processor.add_text_to_document(image_texts, images)
+                # Step 4: Save the modified document
+                with metrics.timer('save_seconds') as stages['save']:
+                    modified_doc.save(output_path)
+            if checkpoint is not None:
+                checkpoint.complete()
+            logger.info(f"Saved processed document to: {describe_document(output_path)}")
         
-        # Step 4: Save the modified document
-        modified_doc.save(output_path)
-        logger.info(f"Saved processed document to: {output_path}")
+            if profile is not None:
+                profile.stages.update({stage: timing['seconds'] for stage, timing in stages.items()})
+        finally:
+            # Every exit, including a client disconnecting from a stream, releases the .docx package
+            extractor.close()
+    except OCRBusyError:
+        # Images finished so far are kept in the checkpoint for the client's retry
+        metrics.inc('documents_total', result='busy')
+        raise
+    except Exception:
+        metrics.inc('documents_total', result='error')
+        raise
+    
+    metrics.inc('documents_total', result='success')
+    message = f"Successfully processed {processed_count} images"
+    if duplicates_reused:
+        message += f" ({duplicates_reused} duplicate images reused earlier OCR results)"
+    if skipped_non_text:
+        message += f"; skipped {skipped_non_text} images without text"
+    yield {'type': 'result', 'success': True, 'message': message, 'images_processed': processed_count}
+
+
+def record_image_metrics(record: dict):
+    """Count an image result from OCRProcessor.iter_text_from_images"""
+    if record['skipped']:
+        metrics.inc('images_skipped_total', reason=record['skip_reason'])
+    elif record['failed']:
+        metrics.inc('images_failed_total')
+    else:
+        metrics.inc('images_processed_total')
+        if not (record['cached'] or record['duplicate'] or record['resumed']):
+            metrics.observe('ocr_image_seconds', (record['prepare_ms'] + record['ocr_ms']) / 1000)
+
+
+def process_document(input_path, output_path, text_placement: str = 'below',
+                     lang: str = 'eng', enhanced: bool = False, workers: int = None,
+                     profile: DocumentProfile = None, output_format: str = text_export.DOCX,
+                     document_name: str = None):
+    """
+    Process a Word document to extract text from images
+    
+    The input and output can be paths or seekable binary files, and the
+    output a text format, as for iter_process_document().
+    
+    Returns:
+        tuple: (success: bool, message: str, images_processed: int)
+    """
+    try:
+        with profile.capture() if profile is not None else nullcontext():
+            for record in iter_process_document(input_path, output_path, text_placement=text_placement,
+                                                lang=lang, enhanced=enhanced, workers=workers,
+                                                profile=profile, output_format=output_format,
+                                                document_name=document_name):
+                pass
         
-        return True, f"Successfully processed {processed_count} images", processed_count
+        return record['success'], record['message'], record['images_processed']
         
+    except OCRBusyError:
+        raise
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}")
         return False, f"Error processing document: {str(e)}", 0
 
 
-def cleanup_old_files(folder: Path, max_age_hours: int = 24):
-    """Remove files older than max_age_hours"""
-    import time
-    current_time = time.time()
-    max_age_seconds = max_age_hours * 3600
+def run_job(options: dict) -> dict:
+    """Process a queued document; raises on failure so the job is marked failed"""
+    # Jobs queued before the format and profile options existed have neither
+    profile_mode = options.get('profile')
+    profile = (DocumentProfile(options['original_filename'], cprofile=profile_mode == 'cprofile')
+               if profile_mode else None)
+    success, message, images_processed = process_document(
+        options['input_path'],
+        options['output_path'],
+        text_placement=options['text_placement'],
+        lang=options['lang'],
+        enhanced=options['enhanced'],
+        workers=options['workers'],
+        profile=profile,
+        output_format=options.get('output_format', text_export.DOCX),
+        document_name=options['original_filename']
+    )
     
-    for file_path in folder.iterdir():
-        if file_path.is_file():
-            file_age = current_time - file_path.stat().st_mtime
-            if file_age > max_age_seconds:
-                try:
-                    file_path.unlink()
-                    logger.info(f"Cleaned up old file: {file_path}")
-                except Exception as e:
-                    logger.error(f"Failed to delete {file_path}: {e}")
+    if not success:
+        raise RuntimeError(message)
+    
+    result = {
+        'message': message,
+        'images_processed': images_processed,
+        'output_filename': options['output_filename']
+    }
+    if profile is not None:
+        result['profile'] = profile_report(profile)
+    return result
+
+
+def busy_response(error: OCRBusyError):
+    """503 with Retry-After for a request whose OCR found no free slot within the wait budget"""
+    response = jsonify({'error': f"Server is busy, please retry later ({error})",
+                        'retry_after': config.OCR_BUSY_RETRY_AFTER})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(config.OCR_BUSY_RETRY_AFTER)
+    return response
+
+
+def requested_profile_mode():
+    """
+    'report' if the client sent "X-Profile: 1", 'cprofile' for
+    "X-Profile: cprofile" (the report plus the top cProfile functions),
+    else None
+    """
+    value = request.headers.get('X-Profile', '').strip().lower()
+    if value in ('', '0', 'false', 'no'):
+        return None
+    return 'cprofile' if value == 'cprofile' else 'report'
+
+
+def requested_profile(document_name: str):
+    """DocumentProfile for the request if the client sent an X-Profile header, else None"""
+    mode = requested_profile_mode()
+    if mode is None:
+        return None
+    return DocumentProfile(document_name, cprofile=mode == 'cprofile')
+
+
+def profile_report(profile: DocumentProfile) -> dict:
+    """A profile as returned to API clients"""
+    report = profile.to_dict()
+    if profile.top_functions():
+        report['cprofile'] = profile.top_functions()
+    return report
+
+
+@app.before_request
+def start_job_workers():
+    """Start this worker process's job threads and janitor on its first request"""
+    job_queue.start(run_job)
+    janitor.start()
+
+
+@app.before_request
+def count_request_start():
+    """Count the request as in flight (scrapes of /metrics and /health probes are not counted)"""
+    if request.endpoint not in ('metrics_endpoint', 'health_check'):
+        g.in_flight = True
+        metrics.add_to_gauge('requests_in_flight', 1)
+
+
+@app.teardown_request
+def count_request_end(exc):
+    if g.pop('in_flight', False):
+        metrics.add_to_gauge('requests_in_flight', -1)
 
 
 @app.route('/')
@@ -147,10 +389,6 @@ def index():
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Handle file upload and processing"""
-    # Cleanup old files periodically
-    cleanup_old_files(UPLOAD_FOLDER)
-    cleanup_old_files(OUTPUT_FOLDER)
-    
     # Check if file was uploaded
     if 'file' not in request.files:
         flash('No file selected', 'error')
@@ -171,46 +409,77 @@ def upload_file():
         text_placement = request.form.get('text_placement', 'below')
         language = request.form.get('language', 'eng')
         enhanced = request.form.get('enhanced', 'false') == 'true'
+        workers = get_worker_count(request.form.get('workers'))
+        
+        error = language_error(language)
+        if error:
+            flash(error, 'error')
+            return redirect(url_for('index'))
         
-        # Save uploaded file
+        # OCR runs in a job worker thread, not in this request, so a large document
+        # does not hold a web worker; the job page polls until it is done
         unique_filename = generate_unique_filename(file.filename)
         input_path = UPLOAD_FOLDER / unique_filename
         file.save(str(input_path))
-        logger.info(f"File uploaded: {input_path}")
+        metrics.inc('uploaded_bytes_total', input_path.stat().st_size)
+        logger.info(f"File uploaded: {file.filename} ({input_path.stat().st_size} bytes)")
         
         # Generate output filename
         output_filename = unique_filename.replace('.docx', '_processed.docx')
-        output_path = OUTPUT_FOLDER / output_filename
         
-        # Process the document
-        success, message, images_processed = process_document(
-            str(input_path),
-            str(output_path),
-            text_placement=text_placement,
-            lang=language,
-            enhanced=enhanced
-        )
+        try:
+            job_id = job_queue.submit({
+                'input_path': str(input_path),
+                'output_path': str(OUTPUT_FOLDER / output_filename),
+                'output_filename': output_filename,
+                'original_filename': file.filename,
+                'text_placement': text_placement,
+                'lang': language,
+                'enhanced': enhanced,
+                'workers': workers
+            })
+        except QueueFullError:
+            input_path.unlink()
+            response = app.make_response((render_template(
+                'error.html', error='The server is busy right now. Please try again in a minute.'), 503))
+            response.headers['Retry-After'] = str(config.JOB_RETRY_AFTER)
+            return response
         
-        if success:
-            flash(f'{message}', 'success')
-            return render_template('result.html', 
-                                   filename=output_filename,
-                                   original_filename=file.filename,
-                                   images_processed=images_processed,
-                                   message=message)
-        else:
-            flash(message, 'error')
-            # Clean up uploaded file on failure
-            if input_path.exists():
-                input_path.unlink()
-            return redirect(url_for('index'))
-            
+        return redirect(url_for('job_page', job_id=job_id))
+    
     except Exception as e:
         logger.error(f"Upload error: {str(e)}")
         flash(f'An error occurred: {str(e)}', 'error')
         return redirect(url_for('index'))
 
 
+@app.route('/jobs/<job_id>')
+def job_page(job_id):
+    """Progress page of a document uploaded with the form; shows the result once the job is done"""
+    job = job_queue.get(job_id)
+    
+    if job is None:
+        flash('Job not found or expired', 'error')
+        return redirect(url_for('index'))
+    
+    if job['status'] == 'done':
+        result = job['result']
+        return render_template('result.html',
+                               filename=result['output_filename'],
+                               original_filename=job['options']['original_filename'],
+                               images_processed=result['images_processed'],
+                               message=result['message'])
+    if job['status'] == 'failed':
+        flash(job['error'], 'error')
+        return redirect(url_for('index'))
+    
+    return render_template('processing.html',
+                           original_filename=job['options']['original_filename'],
+                           status=job['status'],
+                           position=job.get('position'),
+                           refresh_seconds=config.JOB_PAGE_REFRESH)
+
+
 @app.route('/download/<filename>')
 def download_file(filename):
     """Download processed file"""
@@ -225,7 +494,7 @@ def download_file(filename):
             str(file_path),
             as_attachment=True,
             download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+            mimetype=text_export.MIMETYPES.get(file_path.suffix.lstrip('.'), DOCX_MIMETYPE)
         )
     except Exception as e:
         logger.error(f"Download error: {str(e)}")
@@ -235,7 +504,22 @@ def download_file(filename):
 
 @app.route('/api/process', methods=['POST'])
 def api_process():
-    """API endpoint for programmatic access"""
+    """
+    API endpoint for programmatic access
+    
+    By default the output is stored and the JSON response has a download
+    URL. With persist=false the processed document itself is the response
+    (message and image count in the X-Message and X-Images-Processed
+    headers) and nothing is written to disk for small documents.
+    
+    With format=json, jsonl or txt the response is only the text of each
+    image with its position (see text_export), always returned directly;
+    the document is not rebuilt.
+    
+    Send "X-Profile: 1" to get a performance report in the JSON response;
+    it is rejected for responses that are not JSON (persist=false or a
+    text format).
+    """
     if 'file' not in request.files:
         return jsonify({'error': 'No file provided'}), 400
     
@@ -249,47 +533,280 @@ def api_process():
         text_placement = request.form.get('text_placement', 'below')
         language = request.form.get('language', 'eng')
         enhanced = request.form.get('enhanced', 'false').lower() == 'true'
+        workers = get_worker_count(request.form.get('workers'))
+        persist = request.form.get('persist', str(config.API_PERSIST_OUTPUT)).lower() == 'true'
+        output_format = request.form.get('format', text_export.DOCX).lower()
+        
+        if output_format not in text_export.FORMATS:
+            return jsonify({'error': f"Invalid format. Choose from: {', '.join(text_export.FORMATS)}"}), 400
+        if output_format != text_export.DOCX:
+            persist = False
+        
+        profile = requested_profile(file.filename)
+        if profile is not None and not persist:
+            return jsonify({'error': "X-Profile needs a JSON response: send persist=true and format=docx"}), 400
+        
+        error = language_error(language)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Save and process
+        # Process the upload from its in-memory stream
         unique_filename = generate_unique_filename(file.filename)
-        input_path = UPLOAD_FOLDER / unique_filename
-        file.save(str(input_path))
+        metrics.inc('uploaded_bytes_total', stream_size(file.stream))
         
-        output_filename = unique_filename.replace('.docx', '_processed.docx')
-        output_path = OUTPUT_FOLDER / output_filename
+        output_filename = unique_filename.replace('.docx', f'_processed.{output_format}')
+        if persist:
+            output = str(OUTPUT_FOLDER / output_filename)
+        else:
+            output = SpooledTemporaryFile(max_size=config.UPLOAD_SPOOL_MAX_BYTES, dir=config.SPOOL_DIR)
         
-        success, message, images_processed = process_document(
-            str(input_path),
-            str(output_path),
-            text_placement=text_placement,
-            lang=language,
-            enhanced=enhanced
-        )
+        with wait_budget(config.OCR_SLOT_WAIT_BUDGET):
+            success, message, images_processed = process_document(
+                file.stream,
+                output,
+                text_placement=text_placement,
+                lang=language,
+                enhanced=enhanced,
+                workers=workers,
+                profile=profile,
+                output_format=output_format,
+                document_name=file.filename
+            )
+        
+        if success and not persist:
+            # send_file closes the buffer once the response has been sent
+            output.seek(0)
+            is_docx = output_format == text_export.DOCX
+            response = send_file(output, as_attachment=is_docx, download_name=output_filename,
+                                 mimetype=DOCX_MIMETYPE if is_docx else text_export.MIMETYPES[output_format])
+            response.headers['X-Message'] = message
+            response.headers['X-Images-Processed'] = str(images_processed)
+            return response
+        if not persist:
+            output.close()
         
         if success:
-            return jsonify({
+            response = {
                 'success': True,
                 'message': message,
                 'images_processed': images_processed,
                 'download_url': url_for('download_file', filename=output_filename, _external=True)
-            })
+            }
+            if profile is not None:
+                response['profile'] = profile_report(profile)
+            return jsonify(response)
         else:
             return jsonify({'success': False, 'error': message}), 400
-            
+    
+    except OCRBusyError as e:
+        return busy_response(e)
     except Exception as e:
         logger.error(f"API error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/process/stream', methods=['POST'])
+def api_process_stream():
+    """
+    API endpoint that streams one record per image as soon as its OCR finishes
+    
+    Responds with newline-delimited JSON by default, or Server-Sent Events if
+    the client sends "Accept: text/event-stream" or ?format=sse. The last
+    record has type 'result' and carries the download URL (and the
+    performance report if requested with the X-Profile header). If the
+    server's OCR capacity stays busy, the result record has busy: true and
+    retry_after seconds; a retry resumes where this attempt stopped.
+    """
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'error': 'Invalid file'}), 400
+    
+    text_placement = request.form.get('text_placement', 'below')
+    language = request.form.get('language', 'eng')
+    enhanced = request.form.get('enhanced', 'false').lower() == 'true'
+    workers = get_worker_count(request.form.get('workers'))
+    use_sse = (request.args.get('format') == 'sse' or
+               request.accept_mimetypes.best == 'text/event-stream')
+    
+    error = language_error(language)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    # The upload is read from its in-memory stream, which lives as long as the request
+    unique_filename = generate_unique_filename(file.filename)
+    upload = file.stream
+    metrics.inc('uploaded_bytes_total', stream_size(upload))
+    
+    output_filename = unique_filename.replace('.docx', '_processed.docx')
+    output_path = OUTPUT_FOLDER / output_filename
+    
+    def format_record(record):
+        if use_sse:
+            return f"event: {record['type']}\ndata: {json.dumps(record)}\n\n"
+        return json.dumps(record) + '\n'
+    
+    profile = requested_profile(file.filename)
+    
+    def generate():
+        start_time = time.perf_counter()
+        try:
+            # The result record is held back until the profile (if any) is complete
+            with wait_budget(config.OCR_SLOT_WAIT_BUDGET), \
+                    profile.capture() if profile is not None else nullcontext():
+                for record in iter_process_document(upload, str(output_path),
+                                                    text_placement=text_placement, lang=language,
+                                                    enhanced=enhanced, workers=workers,
+                                                    profile=profile, stream=True):
+                    record['elapsed_ms'] = round((time.perf_counter() - start_time) * 1000, 1)
+                    if record['type'] == 'result':
+                        result = record
+                        continue
+                    yield format_record(record)
+            if result['success']:
+                result['download_url'] = url_for('download_file', filename=output_filename,
+                                                 _external=True)
+                if profile is not None:
+                    result['profile'] = profile_report(profile)
+            yield format_record(result)
+        except OCRBusyError as e:
+            # Too late for a 503: the client retries on this record instead
+            yield format_record({'type': 'result', 'success': False, 'busy': True,
+                                 'retry_after': config.OCR_BUSY_RETRY_AFTER,
+                                 'message': f"Server is busy, please retry later ({e})",
+                                 'images_processed': 0})
+        except Exception as e:
+            logger.error(f"Streaming API error: {str(e)}")
+            yield format_record({'type': 'result', 'success': False,
+                                 'message': f"Error processing document: {str(e)}",
+                                 'images_processed': 0})
+    
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    # Ask Nginx not to buffer the stream so records reach the client immediately
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """
+    Queue a document for background processing and return a job id immediately
+    
+    Takes the same options as /api/process, including format and the
+    X-Profile header; the output (and the performance report, if requested)
+    is available from the job's status once it is done.
+    """
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'error': 'Invalid file'}), 400
+    
+    output_format = request.form.get('format', text_export.DOCX).lower()
+    if output_format not in text_export.FORMATS:
+        return jsonify({'error': f"Invalid format. Choose from: {', '.join(text_export.FORMATS)}"}), 400
+    
+    error = language_error(request.form.get('language', 'eng'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    try:
+        # Save the upload; processing happens in a job worker thread
+        unique_filename = generate_unique_filename(file.filename)
+        input_path = UPLOAD_FOLDER / unique_filename
+        file.save(str(input_path))
+        metrics.inc('uploaded_bytes_total', input_path.stat().st_size)
+        
+        output_filename = unique_filename.replace('.docx', f'_processed.{output_format}')
+        
+        try:
+            job_id = job_queue.submit({
+                'input_path': str(input_path),
+                'output_path': str(OUTPUT_FOLDER / output_filename),
+                'output_filename': output_filename,
+                'original_filename': file.filename,
+                'text_placement': request.form.get('text_placement', 'below'),
+                'lang': request.form.get('language', 'eng'),
+                'enhanced': request.form.get('enhanced', 'false').lower() == 'true',
+                'workers': get_worker_count(request.form.get('workers')),
+                'output_format': output_format,
+                'profile': requested_profile_mode()
+            })
+        except QueueFullError as e:
+            input_path.unlink()
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = str(config.JOB_RETRY_AFTER)
+            return response, 503
+        
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': url_for('api_job_status', job_id=job_id, _external=True)
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Job submission error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """Status and, once finished, result of a background job"""
+    job = job_queue.get(job_id)
+    
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    response = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'created': datetime.fromtimestamp(job['created']).isoformat(),
+        'started': datetime.fromtimestamp(job['started']).isoformat() if job['started'] else None,
+        'finished': datetime.fromtimestamp(job['finished']).isoformat() if job['finished'] else None
+    }
+    
+    if job['status'] == 'queued':
+        response['position'] = job['position']
+    elif job['status'] == 'done':
+        result = job['result']
+        response.update({
+            'success': True,
+            'message': result['message'],
+            'images_processed': result['images_processed'],
+            'download_url': url_for('download_file', filename=result['output_filename'], _external=True)
+        })
+        if 'profile' in result:
+            response['profile'] = result['profile']
+    elif job['status'] == 'failed':
+        response.update({'success': False, 'error': job['error']})
+    
+    return jsonify(response)
+
+
 @app.route('/health')
 def health_check():
     """Health check endpoint for monitoring"""
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'queued_jobs': job_queue.depth()
     })
 
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Service metrics in the Prometheus text format, totals across all workers"""
+    body = metrics.render(extra_gauges={'job_queue_depth': job_queue.depth()})
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
 @app.errorhandler(413)
 def too_large(e):
     """Handle file too large error"""
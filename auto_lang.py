@@ -0,0 +1,155 @@
+"""
+Automatic language selection and orientation correction (--lang auto)
+
+Picking 'eng+fra+deu' to be safe makes Tesseract load and run every one of
+those models on every image, and an image turned on its side comes out as
+garbage after a full OCR pass. In auto mode each image first goes through
+Tesseract's orientation and script detection (OSD), which is much cheaper
+than OCR:
+
+- the image is turned upright if OSD is confident it is rotated by 90, 180
+  or 270 degrees
+- the detected script picks a single installed language (the first
+  installed entry of SCRIPT_LANGUAGES); if OSD is unsure, fails (too little
+  text) or no language for the script is installed,
+  config.OCR_AUTO_FALLBACK_LANG is used
+
+OSD runs on the normalized image, with margins cropped and oversized text
+scaled down. Its results are kept in the OCR cache under a key built from
+the encoded image and the normalization settings, so a document image is
+only analysed once whatever the other OCR settings.
+"""
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+import config
+from ocr_cache import OCRCache
+from ocr_engine import OCREngine
+from ocr_governor import OCRBusyError, get_governor
+from image_normalize import signature as normalization_signature
+
+logger = logging.getLogger(__name__)
+
+AUTO = 'auto'
+
+# The traineddata OSD itself needs
+OSD_LANG = 'osd'
+
+# Script name reported by OSD -> languages to use for it, in order of preference.
+# The script/* models cover every language written in a script and are the
+# fallback when no single-language model is installed.
+SCRIPT_LANGUAGES = {
+    'Latin': ['eng', 'script/Latin'],
+    'Cyrillic': ['rus', 'ukr', 'bul', 'srp', 'script/Cyrillic'],
+    'Greek': ['ell', 'script/Greek'],
+    'Arabic': ['ara', 'fas', 'urd', 'script/Arabic'],
+    'Hebrew': ['heb', 'script/Hebrew'],
+    'Han': ['chi_sim', 'chi_tra', 'script/HanS', 'script/HanT'],
+    'Japanese': ['jpn', 'script/Japanese'],
+    'Katakana': ['jpn', 'script/Japanese'],
+    'Hiragana': ['jpn', 'script/Japanese'],
+    'Hangul': ['kor', 'script/Hangul'],
+    'Devanagari': ['hin', 'mar', 'nep', 'script/Devanagari'],
+    'Bengali': ['ben', 'script/Bengali'],
+    'Gurmukhi': ['pan', 'script/Gurmukhi'],
+    'Gujarati': ['guj', 'script/Gujarati'],
+    'Tamil': ['tam', 'script/Tamil'],
+    'Telugu': ['tel', 'script/Telugu'],
+    'Kannada': ['kan', 'script/Kannada'],
+    'Malayalam': ['mal', 'script/Malayalam'],
+    'Thai': ['tha', 'script/Thai'],
+    'Armenian': ['hye', 'script/Armenian'],
+    'Georgian': ['kat', 'script/Georgian'],
+    'Ethiopic': ['amh', 'script/Ethiopic'],
+}
+
+# Rotation OSD asks for (clockwise) -> the PIL transpose that performs it exactly
+_TRANSPOSE = {
+    90: Image.Transpose.ROTATE_270,
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_90,
+}
+
+_NO_RESULT = {'rotate': 0, 'orientation_conf': 0.0, 'script': None, 'script_conf': 0.0}
+
+
+def choose_language(script: str, installed: List[str]) -> Optional[str]:
+    """The preferred installed language for a script, or None if none is installed"""
+    return next((lang for lang in SCRIPT_LANGUAGES.get(script, []) if lang in installed), None)
+
+
+def signature(installed: List[str]) -> str:
+    """Settings that affect auto-mode OCR output, for building cache keys"""
+    return (f"auto:{','.join(installed)}:{config.OCR_AUTO_FALLBACK_LANG}:"
+            f"{config.OCR_AUTO_MIN_ORIENTATION_CONF}:{config.OCR_AUTO_MIN_SCRIPT_CONF}")
+
+
+def cache_key(image_data: bytes) -> str:
+    """Cache key of the OSD result for an encoded image"""
+    return OCRCache.make_key(image_data, OSD_LANG, '--psm 0', False, variant='osd|' + normalization_signature())
+
+
+def detect(image: Image.Image, engine: OCREngine, cache: OCRCache = None, key: str = None) -> Dict:
+    """
+    Orientation and script of an image, from the cache or by running OSD
+
+    OSD failures (typically too little text) are cached too, as a result
+    with no rotation and no script.
+
+    Args:
+        key: From cache_key(); results are only cached with one
+
+    Returns:
+        dict as returned by OCREngine.detect_orientation
+    """
+    if cache is None:
+        key = None  # Nowhere to keep the result
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return json.loads(cached)
+
+    try:
+        with get_governor().slot():
+            osd = engine.detect_orientation(image)
+    except OCRBusyError:
+        raise
+    except Exception as e:
+        logger.debug(f"Orientation and script detection failed: {e}")
+        osd = dict(_NO_RESULT)
+
+    if key is not None:
+        cache.put(key, json.dumps(osd))
+    return osd
+
+
+def orient_and_choose_language(image: Image.Image, engine: OCREngine, cache: OCRCache = None,
+                               key: str = None) -> Tuple[Image.Image, str]:
+    """
+    Turn an image upright and choose the language to OCR it with
+
+    Args:
+        image: Image to analyse
+        engine: OCR engine that runs OSD and knows the installed languages
+        cache: Where OSD results are kept (optional)
+        key: Cache key of the image's OSD result (see cache_key)
+
+    Returns:
+        (image, language): the image, rotated if needed, and the language code
+    """
+    osd = detect(image, engine, cache, key)
+
+    if osd['rotate'] in _TRANSPOSE and osd['orientation_conf'] >= config.OCR_AUTO_MIN_ORIENTATION_CONF:
+        logger.info(f"Rotating {image.width}x{image.height} image by {osd['rotate']} degrees")
+        image = image.transpose(_TRANSPOSE[osd['rotate']])
+
+    lang = None
+    if osd['script'] and osd['script_conf'] >= config.OCR_AUTO_MIN_SCRIPT_CONF:
+        lang = choose_language(osd['script'], engine.languages())
+        if lang is None:
+            logger.warning(f"No installed language for {osd['script']} script; "
+                           f"using {config.OCR_AUTO_FALLBACK_LANG}")
+    return image, lang or config.OCR_AUTO_FALLBACK_LANG
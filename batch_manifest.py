@@ -0,0 +1,146 @@
+"""
+Manifest of the documents a batch run has already processed
+
+batch_process.py keeps one manifest per output directory (a SQLite database)
+recording, for every input document, its size, modification time and
+content hash, the options it was processed with and the output written. On
+the next run an input is skipped when it is unchanged:
+
+- fast path: size and modification time match the manifest (one stat call,
+  no reading of the file)
+- otherwise the file is hashed, so a document that was only touched or
+  copied over with identical content is still skipped
+
+A document is reprocessed if its content, the options or the output file
+changed or went missing. Documents without images are recorded with no
+output, so they are not scanned again either.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '.batch_manifest.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    input TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    options TEXT NOT NULL,
+    output TEXT NOT NULL,
+    processed REAL NOT NULL
+);
+"""
+
+NEW = 'new'
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+
+
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path: Path) -> Tuple[int, int, str]:
+    """
+    Size, modification time and hash of a file, to take before it is processed
+
+    The stat comes first, so an edit made while the file is hashed or
+    processed leaves a modification time that no longer matches.
+    """
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns, file_hash(path)
+
+
+def options_key(options: Dict) -> str:
+    """Canonical form of the processing options that affect the output"""
+    return json.dumps(options, sort_keys=True)
+
+
+class BatchManifest:
+    """Record of processed documents, stored in an output directory"""
+
+    def __init__(self, output_dir: str):
+        """
+        Open (or create) the manifest of an output directory
+
+        Args:
+            output_dir: Directory the processed documents are written to
+        """
+        self.path = Path(output_dir) / MANIFEST_NAME
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def _entry(self, input_path: Path) -> Optional[sqlite3.Row]:
+        return self._conn.execute("SELECT * FROM documents WHERE input = ?",
+                                  (str(input_path.resolve()),)).fetchone()
+
+    def check(self, input_path: Path, output_path: Path, options: Dict) -> str:
+        """
+        Compare an input document with its manifest entry
+
+        Args:
+            input_path: The input document
+            output_path: Where its output would be written
+            options: Processing options that affect the output
+
+        Returns:
+            NEW, CHANGED or UNCHANGED
+        """
+        entry = self._entry(input_path)
+        if entry is None:
+            return NEW
+        if entry['options'] != options_key(options):
+            return CHANGED
+        # An empty output means the document had no images and nothing was written
+        if entry['output'] and (entry['output'] != str(output_path) or not output_path.exists()):
+            return CHANGED
+
+        stat = input_path.stat()
+        if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+            return UNCHANGED
+        if stat.st_size != entry['size'] or file_hash(input_path) != entry['sha256']:
+            return CHANGED
+
+        # Same content with a new timestamp: remember it so the next run takes the fast path
+        self._conn.execute("UPDATE documents SET mtime_ns = ? WHERE input = ?",
+                           (stat.st_mtime_ns, str(input_path.resolve())))
+        return UNCHANGED
+
+    def record(self, input_path: Path, output_path: Optional[Path], options: Dict,
+               input_fingerprint: Tuple[int, int, str]):
+        """
+        Record that an input document was processed successfully
+
+        Args:
+            input_path: The input document
+            output_path: The output written, or None if the document had no images
+            options: Processing options that affect the output
+            input_fingerprint: fingerprint() of the input, taken before it was processed
+        """
+        size, mtime_ns, sha256 = input_fingerprint
+        self._conn.execute(
+            "INSERT OR REPLACE INTO documents (input, size, mtime_ns, sha256, options, output, processed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (str(input_path.resolve()), size, mtime_ns, sha256, options_key(options),
+             str(output_path) if output_path is not None else '', time.time())
+        )
+
+    def close(self):
+        """Close the manifest database"""
+        self._conn.close()
@@ -9,18 +9,33 @@ from pathlib import Path
 import logging
 
 from main import process_document, setup_logging
+from ocr_cache import get_default_cache
+from batch_manifest import BatchManifest, NEW, CHANGED, UNCHANGED, fingerprint
+from text_export import DOCX, FORMATS
 import config
 
 
-def process_directory(input_dir: str, output_dir: str = None, **kwargs):
+def process_directory(input_dir: str, output_dir: str = None, profile: bool = False,
+                      cprofile: bool = False, force: bool = False, **kwargs):
     """
     Process all .docx files in a directory
     
+    Documents processed by an earlier run with the same options and not
+    changed since are skipped (see batch_manifest), unless force is set.
+    
     Args:
         input_dir: Directory containing .docx files
         output_dir: Directory to save processed files (optional)
+        profile: Write a performance report next to each processed file
+        cprofile: Include a cProfile of each document in its report
+        force: Reprocess every document, even unchanged ones
         **kwargs: Additional arguments for process_document
     """
+    # Deferred like main's imports, so the CLI starts without loading Pillow and NumPy
+    from ocr_processor import get_ocr_processor
+    from image_dedup import DuplicateIndex
+    from profiler import DocumentProfile
+    
     logger = logging.getLogger(__name__)
     
     input_path = Path(input_dir)
@@ -46,26 +61,59 @@ def process_directory(input_dir: str, output_dir: str = None, **kwargs):
         output_path = input_path / 'processed'
         output_path.mkdir(exist_ok=True)
     
+    # Near-identical images are OCR'd once across the whole batch
+    dedup_index = DuplicateIndex() if config.DEDUP_ENABLED else None
+    
+    # Everything that changes the output; workers only change the speed, and where
+    # and how the text is inserted only matters when the document is rebuilt
+    manifest = BatchManifest(output_path)
+    options = {name: value for name, value in kwargs.items() if name != 'workers'}
+    options['ocr_config'] = config.OCR_CONFIG
+    if kwargs.get('output_format', DOCX) == DOCX:
+        options.update(text_prefix=config.TEXT_PREFIX, text_suffix=config.TEXT_SUFFIX)
+    else:
+        options.pop('text_placement', None)
+    
     # Process each file
     success_count = 0
+    no_image_count = 0
     failed_files = []
+    changes = {NEW: 0, CHANGED: 0, UNCHANGED: 0}
     
+    extension = kwargs.get('output_format', DOCX)
     for idx, doc_file in enumerate(docx_files, 1):
+        output_file = output_path / f"{doc_file.stem}_processed.{extension}"
+        
+        status = manifest.check(doc_file, output_file, options)
+        changes[status] += 1
+        if status == UNCHANGED and not force:
+            logger.debug(f"Skipping unchanged file {doc_file.name}")
+            continue
+        
         logger.info(f"\n{'='*60}")
-        logger.info(f"Processing file {idx}/{len(docx_files)}: {doc_file.name}")
+        logger.info(f"Processing file {idx}/{len(docx_files)}: {doc_file.name} ({status})")
         logger.info(f"{'='*60}")
         
-        output_file = output_path / f"{doc_file.stem}_processed.docx"
-        
         try:
+            # Taken first, so an edit made during processing is seen as a change next run
+            input_fingerprint = fingerprint(doc_file)
+            timings = {}
             success = process_document(
                 input_path=str(doc_file),
                 output_path=str(output_file),
+                dedup_index=dedup_index,
+                timings=timings,
+                profile=DocumentProfile(doc_file.name, cprofile=cprofile) if profile else None,
                 **kwargs
             )
             
             if success:
                 success_count += 1
+                manifest.record(doc_file, output_file, options, input_fingerprint)
+            elif timings.get('images') == 0:
+                # Nothing to OCR; don't scan it again until it changes
+                no_image_count += 1
+                manifest.record(doc_file, None, options, input_fingerprint)
             else:
                 failed_files.append(doc_file.name)
                 
@@ -78,15 +126,35 @@ def process_directory(input_dir: str, output_dir: str = None, **kwargs):
     logger.info("Batch Processing Summary")
     logger.info(f"{'='*60}")
     logger.info(f"Total files: {len(docx_files)}")
+    logger.info(f"New: {changes[NEW]}, changed: {changes[CHANGED]}, unchanged: {changes[UNCHANGED]}"
+                + (" (reprocessed: --force)" if force else " (skipped)"))
     logger.info(f"Successfully processed: {success_count}")
+    if no_image_count:
+        logger.info(f"Without images (nothing written): {no_image_count}")
     logger.info(f"Failed: {len(failed_files)}")
     
     if failed_files:
         logger.warning(f"Failed files: {', '.join(failed_files)}")
     
+    if dedup_index is not None:
+        logger.info(f"OCR calls saved by near-duplicate detection: {dedup_index.ocr_calls_saved}")
+    
+    if config.TEXT_CLASSIFIER_ENABLED:
+        ocr = get_ocr_processor(lang=kwargs.get('lang'))
+        logger.info(f"Non-text images skipped by the text classifier: {ocr.stats['skipped_non_text']} "
+                    f"(~{ocr.ocr_seconds_saved():.1f}s of OCR saved)")
+    
+    cache = get_default_cache()
+    if cache is not None:
+        stats = cache.stats()
+        logger.info(f"OCR cache: {stats['entries']} entries, "
+                    f"{stats['hits']} hits / {stats['misses']} misses "
+                    f"({stats['hit_rate']:.1%} hit rate)")
+    
     logger.info(f"Output directory: {output_path}")
     logger.info(f"{'='*60}")
     
+    manifest.close()
     return len(failed_files) == 0
 
 
@@ -100,6 +168,10 @@ Examples:
   python batch_process.py ./documents
   python batch_process.py ./documents -o ./output
   python batch_process.py ./documents --placement replace --enhanced
+  python batch_process.py ./documents --workers 4
+  python batch_process.py ./documents --profile
+  python batch_process.py ./documents --force
+  python batch_process.py ./documents --format json
         """
     )
     
@@ -124,7 +196,7 @@ Examples:
     parser.add_argument(
         '-l', '--lang',
         default=config.OCR_LANG,
-        help=f'OCR language code (default: {config.OCR_LANG})'
+        help=f'OCR language code, or auto to detect it per image (default: {config.OCR_LANG})'
     )
     
     parser.add_argument(
@@ -133,6 +205,39 @@ Examples:
         help='Use enhanced OCR with image preprocessing'
     )
     
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=config.OCR_WORKERS,
+        help=f'Number of images to OCR in parallel per document (default: {config.OCR_WORKERS})'
+    )
+    
+    parser.add_argument(
+        '-f', '--format',
+        choices=FORMATS,
+        default=DOCX,
+        help='docx: write each document with the text inserted (default); json, jsonl, txt: '
+             'write only the text of each image with its position, without rebuilding the documents'
+    )
+    
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Reprocess documents that are unchanged since the last run'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Write a JSON and HTML performance report next to each processed document'
+    )
+    
+    parser.add_argument(
+        '--cprofile',
+        action='store_true',
+        help='With --profile, also record a cProfile of each document (main thread only)'
+    )
+    
     parser.add_argument(
         '--log-level',
         choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
@@ -151,7 +256,12 @@ Examples:
         output_dir=args.output_dir,
         text_placement=args.placement,
         lang=args.lang,
-        enhanced=args.enhanced
+        enhanced=args.enhanced,
+        workers=args.workers,
+        output_format=args.format,
+        profile=args.profile,
+        cprofile=args.cprofile,
+        force=args.force
     )
     
     sys.exit(0 if success else 1)
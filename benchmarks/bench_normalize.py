@@ -0,0 +1,100 @@
+"""
+Per-image OCR time with and without image normalization
+
+Generates synthetic images that cover the cases normalization targets (a
+large phone photo of a whiteboard, a page scan with wide margins, a tiny
+screenshot, an ordinary screenshot) and times decode + OCR for each, with
+config.NORMALIZE_ENABLED off and on. Requires Tesseract.
+
+Usage:
+    python -m benchmarks.bench_normalize
+    python -m benchmarks.bench_normalize --repeat 5
+"""
+import argparse
+import io
+import logging
+import time
+
+from PIL import Image, ImageDraw
+
+import config
+from benchmarks.docgen import load_font
+from ocr_processor import OCRProcessor
+
+SAMPLE_TEXT = "The quick brown fox jumps over the lazy dog"
+
+
+def render(size, lines: int, font_size: int, origin=(20, 20), background='white', fmt='PNG',
+           quality: int = 90) -> bytes:
+    """Render lines of text into an encoded image"""
+    image = Image.new('RGB', size, background)
+    draw = ImageDraw.Draw(image)
+    font = load_font(font_size)
+    for idx in range(lines):
+        draw.text((origin[0], origin[1] + idx * font_size * 1.5), f"{SAMPLE_TEXT} {idx}",
+                  fill='black', font=font)
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, quality=quality)
+    return buffer.getvalue()
+
+
+def sample_images():
+    """(name, encoded image) pairs covering the normalization cases"""
+    return [
+        ('whiteboard photo 6000x4000 JPEG', render((6000, 4000), 6, 160, origin=(400, 400),
+                                                   background=(235, 235, 225), fmt='JPEG')),
+        ('page scan 2550x3300, wide margins', render((2550, 3300), 10, 40, origin=(600, 900))),
+        ('tiny screenshot 260x24', render((260, 24), 1, 9, origin=(4, 6))),
+        ('screenshot 800x200', render((800, 200), 3, 20)),
+    ]
+
+
+def time_ocr(ocr: OCRProcessor, image_data: bytes, repeat: int) -> float:
+    """Best time in seconds to decode and OCR an image"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ocr.extract_text_from_bytes(image_data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(repeat: int):
+    # Measure OCR itself, not cache lookups
+    ocr = OCRProcessor()
+    ocr.cache = None
+
+    print(f"{'image':<36} {'plain ms':>10} {'normalized ms':>14} {'speedup':>8}")
+    enabled = config.NORMALIZE_ENABLED
+    try:
+        for name, image_data in sample_images():
+            config.NORMALIZE_ENABLED = False
+            plain = time_ocr(ocr, image_data, repeat)
+            config.NORMALIZE_ENABLED = True
+            normalized = time_ocr(ocr, image_data, repeat)
+            print(f"{name:<36} {plain * 1000:>10.0f} {normalized * 1000:>14.0f} {plain / normalized:>7.1f}x")
+    finally:
+        config.NORMALIZE_ENABLED = enabled
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure per-image OCR time with and without image normalization',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m benchmarks.bench_normalize
+  python -m benchmarks.bench_normalize --repeat 5
+        """
+    )
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per image and mode; the best time is reported (default: 3)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    run(args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+End-to-end throughput benchmark
+
+Generates synthetic documents (see benchmarks.docgen), runs each through
+main.process_document and reports throughput (documents per minute, images
+per second), per-image OCR latency (p50/p95) and the time spent in each
+stage (extract, ocr, reconstruct, save). The OCR cache is bypassed so that
+every run does the same work. Requires Tesseract.
+
+Results can be written as JSON and compared with a saved baseline; the run
+fails (exit code 1) if any metric is worse than the baseline by more than
+the tolerance.
+
+Usage:
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --docs 10 --images 20 --table-images 4 --header-images 1
+    python -m benchmarks.bench_pipeline --output baseline.json
+    python -m benchmarks.bench_pipeline --baseline baseline.json --tolerance 0.15
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.docgen import generate_document
+from main import process_document
+from ocr_processor import get_ocr_processor
+
+STAGES = ('extract', 'ocr', 'reconstruct', 'save')
+
+# Metric name -> (True if higher is better, smallest absolute change that is not noise)
+METRICS = {
+    'docs_per_minute': (True, 0.0),
+    'images_per_second': (True, 0.0),
+    'image_ms_p50': (False, 1.0),
+    'image_ms_p95': (False, 1.0),
+    **{f'{stage}_seconds': (False, 0.05) for stage in STAGES},
+}
+
+
+def run(docs: int, paragraphs: int, images: int, table_images: int, header_images: int,
+        seed: int, workers: int = None, enhanced: bool = False, use_cache: bool = False) -> dict:
+    """
+    Generate and process documents, returning the results as a dictionary
+
+    Documents are generated with seeds seed, seed + 1, ... so that each one
+    is different but every run of the benchmark sees the same documents.
+    """
+    ocr = get_ocr_processor()  # Probes Tesseract before any timing starts
+    cache = ocr.cache
+    if not use_cache:
+        ocr.cache = None
+
+    stage_totals = {stage: 0.0 for stage in STAGES}
+    image_ms = []
+    image_count = 0
+    failures = 0
+    try:
+        with tempfile.TemporaryDirectory(prefix='bench_pipeline_') as workdir:
+            paths = []
+            for idx in range(docs):
+                path = os.path.join(workdir, f"doc_{idx}.docx")
+                image_count += generate_document(path, paragraphs, images, table_images,
+                                                 header_images, seed + idx)
+                paths.append(path)
+
+            start = time.perf_counter()
+            for path in paths:
+                timings = {}
+                if not process_document(path, workers=workers, enhanced=enhanced, timings=timings):
+                    failures += 1
+                    continue
+                for stage in STAGES:
+                    stage_totals[stage] += timings[stage]
+                image_ms.extend(timings['image_ms'])
+            elapsed = time.perf_counter() - start
+    finally:
+        ocr.cache = cache
+
+    results = {
+        'docs_per_minute': docs / elapsed * 60,
+        'images_per_second': image_count / elapsed,
+        'image_ms_p50': float(np.percentile(image_ms, 50)) if image_ms else 0.0,
+        'image_ms_p95': float(np.percentile(image_ms, 95)) if image_ms else 0.0,
+        **{f'{stage}_seconds': seconds for stage, seconds in stage_totals.items()},
+    }
+    return {
+        'settings': {
+            'docs': docs, 'paragraphs': paragraphs, 'images': images, 'table_images': table_images,
+            'header_images': header_images, 'seed': seed, 'workers': workers, 'enhanced': enhanced,
+            'use_cache': use_cache,
+        },
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'total_seconds': elapsed,
+        'images': image_count,
+        'images_ocrd': len(image_ms),
+        'failures': failures,
+        'results': results,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Print each metric next to its baseline value
+
+    Returns:
+        Names of the metrics that are worse than the baseline by more than
+        tolerance (and by more than the noise level of the metric)
+    """
+    if results['settings'] != baseline.get('settings'):
+        print("Warning: baseline was recorded with different settings; comparison may be meaningless")
+
+    regressions = []
+    print(f"{'metric':<22} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, (higher_is_better, noise) in METRICS.items():
+        old = baseline['results'].get(name)
+        new = results['results'][name]
+        if not old:
+            print(f"{name:<22} {'-':>12} {new:>12.2f}")
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > tolerance and abs(new - old) > noise else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<22} {old:>12.2f} {new:>12.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def print_results(results: dict):
+    metrics = results['results']
+    print(f"{results['settings']['docs']} documents, {results['images']} images "
+          f"({results['images_ocrd']} OCR'd) in {results['total_seconds']:.2f}s")
+    if results['failures']:
+        print(f"{results['failures']} documents failed to process")
+    print(f"  {metrics['docs_per_minute']:.1f} docs/min, {metrics['images_per_second']:.2f} images/sec")
+    print(f"  per-image OCR latency: p50 {metrics['image_ms_p50']:.1f}ms, p95 {metrics['image_ms_p95']:.1f}ms")
+    print("  stages: " + ", ".join(f"{stage} {metrics[f'{stage}_seconds']:.2f}s" for stage in STAGES))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure end-to-end document throughput on synthetic documents',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m benchmarks.bench_pipeline
+  python -m benchmarks.bench_pipeline --docs 10 --images 20 --table-images 4 --header-images 1
+  python -m benchmarks.bench_pipeline --output baseline.json
+  python -m benchmarks.bench_pipeline --baseline baseline.json --output current.json
+        """
+    )
+    parser.add_argument('--docs', type=int, default=5, help='Number of documents (default: 5)')
+    parser.add_argument('--paragraphs', type=int, default=50, help='Text paragraphs per document (default: 50)')
+    parser.add_argument('--images', type=int, default=10, help='Body images per document (default: 10)')
+    parser.add_argument('--table-images', type=int, default=2,
+                        help='Table cell images per document (default: 2)')
+    parser.add_argument('--header-images', type=int, default=1,
+                        help='Header images per document (default: 1)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first document (default: 0)')
+    parser.add_argument('--workers', type=int, help='Images to OCR in parallel (default: config.OCR_WORKERS)')
+    parser.add_argument('--enhanced', action='store_true', help='Use enhanced OCR with preprocessing')
+    parser.add_argument('--use-cache', action='store_true',
+                        help='Use the OCR cache (measures warm runs; default: bypass it)')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare with results saved by an earlier --output')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed relative slowdown before a metric counts as a regression (default: 0.10)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run(args.docs, args.paragraphs, args.images, args.table_images, args.header_images,
+                  args.seed, workers=args.workers, enhanced=args.enhanced, use_cache=args.use_cache)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.tolerance:.0%}: "
+                  f"{', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Scaling benchmark for document reconstruction
+
+Builds synthetic documents of increasing size with one image position every
+few paragraphs and times DocumentProcessor.add_text_to_document on each.
+Reconstruction should be linear in document size, so the time per paragraph
+stays roughly flat as the document grows.
+
+Usage:
+    python -m benchmarks.bench_reconstruction
+    python -m benchmarks.bench_reconstruction --sizes 1000 4000 16000 --placement replace
+"""
+import argparse
+import logging
+import time
+
+from docx import Document
+
+from document_processor import DocumentProcessor
+from image_extractor import ImageInfo
+
+
+def build_document(paragraphs: int, image_every: int):
+    """
+    Build a document and the image positions the scanner would report for it
+
+    The reconstruction step only needs positions, so the images are fake:
+    every image_every-th paragraph gets an extra run standing in for one.
+    """
+    document = Document()
+    images = []
+    for idx in range(paragraphs):
+        paragraph = document.add_paragraph(f"Paragraph {idx}")
+        if idx % image_every == 0:
+            paragraph.add_run("[image]")
+            images.append(ImageInfo(b'', f"image_{len(images) + 1}", idx, 1))
+
+    # Document() starts with no paragraphs, so indices match the scanner's
+    texts = {img.image_id: f"Text of {img.image_id}" for img in images}
+    return document, images, texts
+
+
+def run(sizes, image_every: int, placement: str, repeat: int):
+    print(f"{'paragraphs':>10} {'images':>8} {'seconds':>10} {'us/paragraph':>13}")
+    for size in sizes:
+        best = None
+        for _ in range(repeat):
+            document, images, texts = build_document(size, image_every)
+            processor = DocumentProcessor(document, placement)
+            start = time.perf_counter()
+            processor.add_text_to_document(texts, images)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{size:>10} {len(images):>8} {best:>10.3f} {best / size * 1e6:>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure how reconstruction time scales with document size',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m benchmarks.bench_reconstruction
+  python -m benchmarks.bench_reconstruction --sizes 1000 4000 16000
+  python -m benchmarks.bench_reconstruction --placement replace --image-every 5
+        """
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1000, 2000, 4000, 8000],
+                        help='Document sizes in paragraphs (default: 500 1000 2000 4000 8000)')
+    parser.add_argument('--image-every', type=int, default=10,
+                        help='Put an image position every N paragraphs (default: 10)')
+    parser.add_argument('--placement', choices=['below', 'replace'], default='below',
+                        help='Text placement mode (default: below)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per size; the best time is reported (default: 3)')
+    args = parser.parse_args()
+
+    # Per-image logging would dominate the timings
+    logging.basicConfig(level=logging.WARNING)
+    run(args.sizes, args.image_every, args.placement, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
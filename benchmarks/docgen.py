@@ -0,0 +1,139 @@
+"""
+Synthetic Word documents for benchmarks
+
+Generates reproducible .docx files: the same arguments and seed always give
+the same paragraphs and the same image bytes. Images are rendered text at a
+range of font sizes (so normalization and OCR see realistic work) and are
+placed in body paragraphs, table cells and the page header.
+
+Usage:
+    python -m benchmarks.docgen sample.docx
+    python -m benchmarks.docgen sample.docx --paragraphs 200 --images 40 --table-images 10 --seed 7
+"""
+import argparse
+import io
+import random
+from datetime import datetime
+
+from docx import Document
+from docx.shared import Inches
+from PIL import Image, ImageDraw, ImageFont
+
+WORDS = ("invoice total amount account report quarter revenue customer order shipping "
+         "address payment balance summary market growth forecast region product service "
+         "contract delivery schedule meeting review status update project budget").split()
+
+FONT_SIZES = (12, 16, 24, 36)
+
+
+def load_font(size: int):
+    """The default font at the given size, where Pillow supports sizing it"""
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has a single bitmap font size
+        return ImageFont.load_default()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    """A capitalized run of random words"""
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def render_text_image(rng: random.Random, font_size: int = None) -> bytes:
+    """Render a few lines of random text into a PNG"""
+    font_size = font_size or rng.choice(FONT_SIZES)
+    lines = [sentence(rng, rng.randint(3, 8)) for _ in range(rng.randint(1, 6))]
+    font = load_font(font_size)
+    line_height = int(font_size * 1.5)
+    margin = max(font_size, 20)  # Keeps one-line images above config.MIN_IMAGE_SIZE
+    width = max(int(font.getlength(line)) for line in lines) + 2 * margin
+    height = line_height * len(lines) + 2 * margin
+
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    for idx, line in enumerate(lines):
+        draw.text((margin, margin + idx * line_height), line, fill='black', font=font)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _add_picture(paragraph, image_data: bytes):
+    paragraph.add_run().add_picture(io.BytesIO(image_data), width=Inches(4))
+
+
+def generate_document(path: str, paragraphs: int = 50, images: int = 10, table_images: int = 0,
+                      header_images: int = 0, seed: int = 0) -> int:
+    """
+    Write a synthetic document
+
+    Args:
+        path: Output .docx path
+        paragraphs: Number of body text paragraphs
+        images: Number of images in body paragraphs, spread evenly
+        table_images: Number of images in the cells of a table after the body text
+        header_images: Number of images in the page header
+        seed: Random seed; the same seed gives the same document
+
+    Returns:
+        Total number of images in the document
+    """
+    rng = random.Random(seed)
+    document = Document()
+    # Fixed metadata, so the only thing that changes between runs is the zip timestamps
+    document.core_properties.created = datetime(2000, 1, 1)
+    document.core_properties.modified = datetime(2000, 1, 1)
+
+    header = document.sections[0].header
+    for _ in range(header_images):
+        _add_picture(header.add_paragraph(), render_text_image(rng))
+
+    image_every = max(1, paragraphs // images) if images else 0
+    placed = 0
+    for idx in range(paragraphs):
+        document.add_paragraph(sentence(rng, rng.randint(8, 30)) + ".")
+        if image_every and idx % image_every == 0 and placed < images:
+            _add_picture(document.add_paragraph(), render_text_image(rng))
+            placed += 1
+    # Fewer paragraphs than images: the rest go at the end
+    while placed < images:
+        _add_picture(document.add_paragraph(), render_text_image(rng))
+        placed += 1
+
+    if table_images:
+        columns = 2
+        table = document.add_table(rows=-(-table_images // columns), cols=columns)
+        for idx in range(table_images):
+            cell = table.cell(idx // columns, idx % columns)
+            _add_picture(cell.paragraphs[0], render_text_image(rng))
+
+    document.save(path)
+    return images + table_images + header_images
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate a reproducible synthetic Word document with text images',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m benchmarks.docgen sample.docx
+  python -m benchmarks.docgen sample.docx --paragraphs 200 --images 40 --table-images 10
+  python -m benchmarks.docgen sample.docx --header-images 1 --seed 7
+        """
+    )
+    parser.add_argument('output', help='Path of the .docx file to write')
+    parser.add_argument('--paragraphs', type=int, default=50, help='Body text paragraphs (default: 50)')
+    parser.add_argument('--images', type=int, default=10, help='Images in the body (default: 10)')
+    parser.add_argument('--table-images', type=int, default=0, help='Images in table cells (default: 0)')
+    parser.add_argument('--header-images', type=int, default=0, help='Images in the page header (default: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    total = generate_document(args.output, args.paragraphs, args.images, args.table_images,
+                              args.header_images, args.seed)
+    print(f"Wrote {args.output} with {args.paragraphs} paragraphs and {total} images")
+
+
+if __name__ == '__main__':
+    main()
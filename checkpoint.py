@@ -0,0 +1,151 @@
+"""
+Per-image OCR checkpoints for resuming interrupted documents
+
+While a document is OCR'd, every finished image's text is appended to a
+sidecar file (one JSON line per image) in config.CHECKPOINT_DIR. If the
+process dies or a gunicorn worker times out at image 140 of 150, the next
+attempt at the same document reads the sidecar and only OCRs the images
+that are missing; reconstruction and save are simply redone. The sidecar
+is removed once the output document has been saved.
+
+Sidecars are keyed by a hash of the document bytes and the OCR settings
+(the same key the OCR cache would use for the document), so a re-upload of
+the same file under another name resumes too, while changed settings start
+over.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """Sidecar file of the image texts finished so far for one document"""
+
+    def __init__(self, key: str, directory: str = None):
+        """
+        Open the checkpoint for a document, loading any earlier progress
+
+        Args:
+            key: Hash of the document and its OCR settings
+            directory: Where sidecars are kept (default: config.CHECKPOINT_DIR)
+        """
+        self.directory = Path(directory or config.CHECKPOINT_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"{key}.jsonl"
+        self.texts: Dict[str, str] = self._load()
+        self._lock = threading.Lock()
+        self._file = None
+
+        if self.texts:
+            logger.info(f"Resuming from checkpoint: {len(self.texts)} images already OCR'd")
+
+    def _load(self) -> Dict[str, str]:
+        texts = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # A line cut short when the process died
+                    texts[entry['image_id']] = entry['text']
+        except FileNotFoundError:
+            pass
+        return texts
+
+    def add(self, image_id: str, text: str):
+        """Record an image's text (flushed to the OS right away, so it survives the process)"""
+        line = json.dumps({'image_id': image_id, 'text': text}) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            self.texts[image_id] = text
+
+    def close(self):
+        """Close the sidecar, keeping it for a later resume"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def complete(self):
+        """The document was saved: the checkpoint is no longer needed"""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def document_digest(document) -> bytes:
+    """
+    SHA-256 of a document, read in blocks so it is never held in memory whole
+
+    Args:
+        document: Path of the file, or a seekable binary file (left at the start)
+    """
+    digest = hashlib.sha256()
+    if isinstance(document, (str, Path)):
+        with open(document, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    else:
+        document.seek(0)
+        for block in iter(lambda: document.read(1024 * 1024), b''):
+            digest.update(block)
+        document.seek(0)
+    return digest.digest()
+
+
+def open_checkpoint(key: str) -> Checkpoint:
+    """Open a document's checkpoint, pruning stale sidecars at most once an hour per process"""
+    global _last_prune
+    with _prune_lock:
+        prune_now = time.time() - _last_prune > 3600
+        if prune_now:
+            _last_prune = time.time()
+    if prune_now:
+        prune_checkpoints()
+    return Checkpoint(key)
+
+
+def prune_checkpoints(directory: str = None, max_age_hours: float = None) -> int:
+    """
+    Remove sidecars of documents that were never retried
+
+    Returns:
+        Number of sidecars removed
+    """
+    directory = Path(directory or config.CHECKPOINT_DIR)
+    max_age_hours = max_age_hours if max_age_hours is not None else config.CHECKPOINT_MAX_AGE_HOURS
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.name.endswith('.jsonl') and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError as e:
+            logger.debug(f"Failed to remove checkpoint {entry.path}: {e}")
+    if removed:
+        logger.info(f"Removed {removed} stale OCR checkpoints")
+    return removed
@@ -1,19 +1,127 @@
 """
 Configuration settings for the Image2Text converter
 """
+import os
+
+# Shared state (cache, job queue, metrics, OCR slots) lives beside the code, so every
+# process on the host uses the same files whatever directory it was started from
+STATE_DIR = os.environ.get('STATE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
 
 # OCR Settings
+OCR_ENGINE = os.environ.get('OCR_ENGINE', 'pytesseract')  # 'pytesseract' (subprocess) or 'tesserocr' (in-process)
 OCR_LANG = 'eng'  # Language for Tesseract OCR (can be 'eng', 'fra', 'deu', etc.)
 OCR_CONFIG = '--psm 3'  # Page Segmentation Mode (3 = Fully automatic page segmentation)
+OCR_WORKERS = 1  # Number of images to OCR in parallel (1 = sequential)
+OCR_MAX_WORKERS = 8  # Upper bound for worker counts requested through the web interface
+OCR_BATCH_MIN_IMAGES = 8  # Use one Tesseract process for many images when a document has at least this many
+OCR_BATCH_SIZE = 32  # Maximum images per batched Tesseract process
+OCR_TILE_MIN_PIXELS = 6_000_000  # Split images this large (after normalization) into bands OCR'd in parallel
+OCR_TILE_BANDS = 4  # Number of bands to split a large image into
+OCR_TILE_WORKERS = 4  # Bands OCR'd concurrently (shared by all images in the process)
+OCR_MAX_IN_FLIGHT = 32  # Maximum images held decoded in memory at once while a document is OCR'd
+OCR_STREAM_CHUNK = 1  # Images per Tesseract call when streaming results (small calls get the first result out sooner)
+
+# Automatic Language Selection (--lang auto: orientation and script detected per image)
+OCR_AUTO_FALLBACK_LANG = 'eng'  # Language used when the script can't be detected or has no installed language
+OCR_AUTO_MIN_ORIENTATION_CONF = 2.0  # Rotate images only when OSD's orientation confidence is at least this
+OCR_AUTO_MIN_SCRIPT_CONF = 1.0  # Trust the detected script only when OSD's script confidence is at least this
+
+# OCR Result Cache (shared by all web workers and batch runs on the host)
+OCR_CACHE_ENABLED = True
+OCR_CACHE_PATH = os.environ.get('OCR_CACHE_PATH', os.path.join(STATE_DIR, 'ocr_cache.db'))
+OCR_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Evict least recently used entries above this size
+OCR_CACHE_MAX_AGE_DAYS = 90  # Evict entries not used for this many days
+OCR_CACHE_EVICT_EVERY = 200  # Check eviction limits after this many new entries
+OCR_CACHE_TOUCH_INTERVAL = 3600  # Seconds; a hit only rewrites an entry's last-used time if it is older than this
+OCR_CACHE_COUNTER_FLUSH_INTERVAL = 30  # Seconds hit/miss counts are kept in memory before being written
+
+# Near-Duplicate Detection (OCR each group of near-identical images only once)
+DEDUP_ENABLED = True
+DEDUP_HASH_SIZE = 48  # Side length of the thumbnail the perceptual hash is computed from
+DEDUP_EDGE_DELTA = 16  # Brightness step (0-255) that counts as an edge in the hash
+DEDUP_THRESHOLD = 0.1  # Maximum fraction of differing edge bits for two images to be treated as duplicates
+DEDUP_MAX_ASPECT_DIFF = 0.1  # Maximum relative aspect-ratio difference between duplicates
+DEDUP_VERIFY_INK_DELTA = 64  # Brightness difference (0-255) from the background that counts as ink when confirming a match
+DEDUP_VERIFY_MAX_PIXELS = 0  # Differing ink pixels allowed after erosion when confirming a match
+
+# Text Classifier (skip photos and graphics that contain no text before OCR)
+TEXT_CLASSIFIER_ENABLED = True
+TEXT_CLASSIFIER_THRESHOLD = 0.2  # Skip images whose text-likelihood score (0-1) is below this
+TEXT_CLASSIFIER_MAX_SIDE = 256  # Longest side of the thumbnail the score is computed on
+TEXT_CLASSIFIER_EDGE_DELTA = 32  # Brightness step (0-255) that counts as an edge or as ink
+TEXT_CLASSIFIER_BACKGROUND_BAND = 8  # Brightness tolerance (0-255) around the background level
+TEXT_CLASSIFIER_BLOCK = 16  # Side (thumbnail pixels) of the blocks the local background level is taken from
+TEXT_CLASSIFIER_MAX_STROKE = 6  # Widest ink run (thumbnail pixels) that counts as a text stroke
+
+# Image Normalization (resize images so text is the size Tesseract works best at)
+NORMALIZE_ENABLED = True
+NORMALIZE_DRAFT_MIN_SIDE = 2000  # Consider reduced-scale decoding for JPEGs with a longer side than this
+NORMALIZE_MAX_SIDE = 4000  # Never enlarge images beyond this longest side
+NORMALIZE_CROP_PADDING = 10  # Pixels of background kept around the ink when cropping margins
+NORMALIZE_INK_DELTA = 48  # Brightness difference (0-255) from the background that counts as ink
+NORMALIZE_TARGET_LINE_HEIGHT = 40  # Height in pixels of a line of text after rescaling (about twice the x-height)
+NORMALIZE_MIN_SCALE = 0.25  # Never shrink images more than this
+NORMALIZE_MAX_SCALE = 4.0  # Never enlarge images more than this
+NORMALIZE_SCALE_TOLERANCE = 1.25  # Leave the size alone when the scale factor is within this ratio of 1
+
+# Enhanced Mode Preprocessing (--enhanced)
+PREPROCESS_STEPS = ['deskew', 'denoise', 'binarize']  # Steps to run, in order; remove any to disable it
+PREPROCESS_BINARIZE_METHOD = 'otsu'  # 'otsu' (global threshold) or 'sauvola' (adaptive, for uneven lighting)
+PREPROCESS_SAUVOLA_WINDOW = 25  # Sauvola neighbourhood size in pixels
+PREPROCESS_SAUVOLA_K = 0.2  # Sauvola sensitivity
+PREPROCESS_MEDIAN_SIZE = 3  # Median denoise neighbourhood size in pixels
+PREPROCESS_MAX_SKEW = 5.0  # Largest skew angle (degrees) deskew looks for
+PREPROCESS_MIN_SKEW = 0.3  # Skew angles (degrees) below this are left alone
+PREPROCESS_SKEW_MIN_GAIN = 2.0  # Only deskew if the best angle sharpens the line profile this much over 0 degrees
 
 # Output Settings
 TEXT_PLACEMENT = 'below'  # Options: 'below' (keep image and add text below) or 'replace' (replace image with text)
 TEXT_PREFIX = '\n[Extracted Text from Image]\n'  # Prefix added before extracted text
 TEXT_SUFFIX = '\n[End of Extracted Text]\n'  # Suffix added after extracted text
 
+# OCR Concurrency (host-wide, shared by all web workers, job threads and CLI runs)
+OCR_MAX_CONCURRENT = os.cpu_count() or 1  # Tesseract calls allowed to run at once on this machine
+OCR_THREAD_LIMIT = 1  # OpenMP threads per Tesseract call (OMP_THREAD_LIMIT, unless already set)
+OCR_SLOT_DIR = os.environ.get('OCR_SLOT_DIR', os.path.join(STATE_DIR, 'ocr_slots'))
+OCR_SLOT_WAIT_BUDGET = 60  # Seconds a web request waits for a free slot before getting a 503
+OCR_BUSY_RETRY_AFTER = 30  # Seconds clients are asked to wait after a 503
+
 # Image Processing
 MIN_IMAGE_SIZE = (50, 50)  # Minimum image size (width, height) to process
 IMAGE_FORMAT = 'PNG'  # Format for temporary image files
 
+# Background Jobs (web API)
+JOB_QUEUE_PATH = os.environ.get('JOB_QUEUE_PATH', os.path.join(STATE_DIR, 'jobs.db'))
+JOB_WORKERS = 1  # Job worker threads per web worker process
+JOB_QUEUE_MAX_DEPTH = 50  # Reject new jobs with 503 when this many are waiting
+JOB_RETRY_AFTER = 60  # Seconds clients are asked to wait when the queue is full
+JOB_MAX_ATTEMPTS = 2  # Give up on a job after its worker died this many times
+JOB_POLL_INTERVAL = 1.0  # Seconds between checks for new jobs
+JOB_RECOVERY_INTERVAL = 60  # Seconds between checks for jobs orphaned by dead workers
+JOB_RETENTION_HOURS = 24  # Finished jobs are forgotten after this long
+JOB_PAGE_REFRESH = 3  # Seconds between reloads of the web form's progress page
+
+# Web Uploads (kept in memory; only larger documents spill to a temporary file)
+UPLOAD_SPOOL_MAX_BYTES = 16 * 1024 * 1024  # Uploads and API outputs up to this size never touch the disk
+SPOOL_DIR = os.environ.get('SPOOL_DIR') or None  # Where larger ones spill (default: the system temp dir)
+API_PERSIST_OUTPUT = True  # /api/process stores outputs for /download; clients can send persist=false for the bytes instead
+
+# Upload/Output Cleanup (background janitor, one sweep at a time across web workers)
+JANITOR_INTERVAL = 600  # Seconds between sweeps
+JANITOR_MAX_AGE_HOURS = 24  # Remove uploads and outputs older than this
+JANITOR_MAX_BYTES = 5 * 1024 ** 3  # Then evict the oldest files until both folders together fit in this
+JANITOR_MIN_AGE = 300  # Seconds; newer files are never evicted for the quota (their download link was just given out)
+JANITOR_LOCK_PATH = os.environ.get('JANITOR_LOCK_PATH', os.path.join(STATE_DIR, 'janitor.lock'))
+
+# OCR Checkpoints (resume interrupted documents without redoing finished images)
+CHECKPOINT_ENABLED = True
+CHECKPOINT_DIR = os.environ.get('CHECKPOINT_DIR', os.path.join(STATE_DIR, 'checkpoints'))
+CHECKPOINT_MAX_AGE_HOURS = 72  # Sidecars of documents never retried are removed after this long
+
+# Service Metrics (/metrics, shared by all web workers)
+METRICS_PATH = os.environ.get('METRICS_PATH', os.path.join(STATE_DIR, 'metrics.db'))
+METRICS_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300]  # Histogram bucket bounds in seconds
+METRICS_FLUSH_INTERVAL = 5  # Seconds each process adds up metric updates in memory before writing them
+
 # Logging
 LOG_LEVEL = 'INFO'  # Options: 'DEBUG', 'INFO', 'WARNING', 'ERROR'
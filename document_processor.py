@@ -2,11 +2,16 @@
 Document processor to reconstruct Word documents with extracted text
 """
 from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
 from typing import List, Dict
 import logging
 import config
+from docx_scanner import iter_paragraphs, paragraph_runs
 from image_extractor import ImageInfo
 
 logger = logging.getLogger(__name__)
@@ -37,17 +42,14 @@ class DocumentProcessor:
         Returns:
             Modified Document object
         """
-        # Create a mapping of (paragraph_index, run_index) to extracted text
-        position_to_text = {}
-        for img in images:
-            if img.image_id in image_texts:
-                key = (img.paragraph_index, img.run_index)
-                position_to_text[key] = image_texts[img.image_id]
+        # Resolve every position against the untouched document first: one
+        # paragraph list per story part, built once, so later insertions can
+        # neither shift indices nor force repeated scans
+        paragraph_lists = {}
+        run_lists = {}
+        targets = []
         
-        # Process paragraphs in reverse order to avoid index shifting
-        processed_paragraphs = set()
-        
-        for img in sorted(images, key=lambda x: (x.paragraph_index, x.run_index), reverse=True):
+        for img in sorted(images, key=lambda x: (x.part_name, x.paragraph_index, x.run_index)):
             if img.image_id not in image_texts:
                 continue
             
@@ -59,30 +61,67 @@ class DocumentProcessor:
                 logger.info(f"No text to add for {img.image_id}")
                 continue
             
+            if img.part_name not in paragraph_lists:
+                try:
+                    paragraph_lists[img.part_name] = list(iter_paragraphs(self._get_part_element(img.part_name)))
+                except KeyError as e:
+                    logger.error(f"Failed to add text for {img.image_id}: {e}")
+                    paragraph_lists[img.part_name] = []
+            
+            paragraphs = paragraph_lists[img.part_name]
+            if para_idx >= len(paragraphs):
+                logger.error(f"Failed to add text for {img.image_id}: paragraph {para_idx} not found")
+                continue
+            
+            targets.append((img, paragraphs[para_idx], text))
+        
+        # Single pass over the resolved targets, in document order
+        last_inserted = {}
+        for img, p_element, text in targets:
             if self.text_placement == 'below':
-                self._add_text_below_image(para_idx, text)
+                # Several images in one paragraph: keep their texts in run order
+                anchor = last_inserted.get(p_element, p_element)
+                new_p = self._add_text_below_image(anchor, text)
+                if new_p is not None:
+                    last_inserted[p_element] = new_p
             elif self.text_placement == 'replace':
-                self._replace_image_with_text(para_idx, img.run_index, text)
+                if p_element not in run_lists:
+                    run_lists[p_element] = paragraph_runs(p_element)
+                self._replace_image_with_text(p_element, run_lists[p_element], img.run_index, text)
             
-            logger.info(f"Added text for {img.image_id} at paragraph {para_idx}")
+            logger.info(f"Added text for {img.image_id} at paragraph {img.paragraph_index}")
         
         return self.document
     
-    def _add_text_below_image(self, para_idx: int, text: str):
-        """Add text in a new paragraph below the image"""
+    def _get_part_element(self, part_name: str):
+        """Root XML element of the story part an image was found in"""
+        main_part = self.document.part
+        if part_name == str(main_part.partname).lstrip('/'):
+            return main_part.element
+        
+        for rel in main_part.rels.values():
+            if rel.is_external or rel.reltype not in (RT.HEADER, RT.FOOTER):
+                continue
+            if str(rel.target_part.partname).lstrip('/') == part_name:
+                return rel.target_part.element
+        
+        raise KeyError(f"Story part not found: {part_name}")
+    
+    def _add_text_below_image(self, anchor, text: str):
+        """
+        Add text in a new paragraph directly after `anchor`
+        
+        The anchor is the <w:p> element holding the image (or the text
+        paragraph added for a previous image in it), which may be in the body,
+        a table cell, a text box, a header or a footer.
+        
+        Returns:
+            The new <w:p> element, or None on failure
+        """
         try:
-            # Get the paragraph containing the image
-            image_paragraph = self.document.paragraphs[para_idx]
-            
-            # Insert a new paragraph after the image paragraph
-            # We need to work with the underlying XML element
-            new_para = self.document.add_paragraph()
-            
-            # Move the new paragraph to the correct position
-            # Get the parent element
-            parent = image_paragraph._element.getparent()
-            # Insert after the image paragraph
-            parent.insert(parent.index(image_paragraph._element) + 1, new_para._element)
+            new_p = OxmlElement('w:p')
+            anchor.addnext(new_p)
+            new_para = Paragraph(new_p, None)
             
             # Add the prefix
             if config.TEXT_PREFIX:
@@ -100,18 +139,28 @@ class DocumentProcessor:
                 suffix_run.bold = True
                 suffix_run.font.color.rgb = RGBColor(0, 100, 0)  # Dark green
             
+            return new_p
+            
         except Exception as e:
-            logger.error(f"Failed to add text below image at paragraph {para_idx}: {e}")
+            logger.error(f"Failed to add text below image: {e}")
+            return None
     
-    def _replace_image_with_text(self, para_idx: int, run_idx: int, text: str):
-        """Replace the image with extracted text"""
+    def _replace_image_with_text(self, p_element, runs: List, run_idx: int, text: str):
+        """
+        Replace the image with extracted text
+        
+        Args:
+            p_element: The <w:p> element holding the image
+            runs: The paragraph's runs as listed before any replacement
+            run_idx: Index of the image's run in `runs`
+            text: Extracted text
+        """
         try:
-            # Get the paragraph containing the image
-            paragraph = self.document.paragraphs[para_idx]
+            paragraph = Paragraph(p_element, None)
             
             # Clear the run containing the image
-            if run_idx < len(paragraph.runs):
-                run = paragraph.runs[run_idx]
+            if run_idx < len(runs):
+                run = Run(runs[run_idx], paragraph)
                 run.clear()
                 
                 # Add the prefix
@@ -131,7 +180,7 @@ class DocumentProcessor:
                     suffix_run.font.color.rgb = RGBColor(0, 100, 0)
             
         except Exception as e:
-            logger.error(f"Failed to replace image at paragraph {para_idx}, run {run_idx}: {e}")
+            logger.error(f"Failed to replace image in run {run_idx}: {e}")
     
     def save_document(self, output_path: str):
         """Save the modified document"""
@@ -0,0 +1,182 @@
+"""
+Fast image scanner for Word documents
+
+Streams the story parts (main document, headers and footers) straight out of
+the .docx zip with incremental XML parsing instead of building the
+python-docx object model. Image references are resolved through the parts'
+.rels files and yielded lazily, so memory and parse time scale with the
+number of images rather than the size of the document.
+
+Image positions are reported per story part as (paragraph_index, run_index):
+
+- paragraph_index counts every <w:p> in the part in document order,
+  including paragraphs inside tables and text boxes
+- run_index counts the <w:r> elements that belong to that paragraph (runs
+  inside a nested paragraph belong to the nested paragraph)
+
+For a plain body paragraph this is the same run numbering as python-docx's
+Paragraph.runs. Use iter_paragraphs() and paragraph_runs() to resolve a
+position against a loaded document.
+"""
+import posixpath
+import zipfile
+from collections import namedtuple
+from typing import Dict, Iterator, List
+
+from lxml import etree
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+A_NS = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PR_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+W_P = f'{{{W_NS}}}p'
+W_R = f'{{{W_NS}}}r'
+A_BLIP = f'{{{A_NS}}}blip'
+R_EMBED = f'{{{R_NS}}}embed'
+RELATIONSHIP = f'{{{PR_NS}}}Relationship'
+
+RT_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+RT_HEADER = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/header'
+RT_FOOTER = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/footer'
+
+DEFAULT_MAIN_PART = 'word/document.xml'
+
+# Elements whose children are top-level blocks; those blocks are discarded
+# once parsed so the tree never holds more than one block at a time
+BLOCK_CONTAINERS = {
+    f'{{{W_NS}}}body',
+    f'{{{W_NS}}}hdr',
+    f'{{{W_NS}}}ftr',
+}
+
+ImageLocation = namedtuple('ImageLocation', ['part_name', 'paragraph_index', 'run_index', 'rel_id', 'target'])
+
+
+def _rels_name(part_name: str) -> str:
+    """Name of the relationships part belonging to a part"""
+    directory, filename = posixpath.split(part_name)
+    return posixpath.join(directory, '_rels', filename + '.rels')
+
+
+def _resolve_target(part_name: str, target: str) -> str:
+    """Resolve a relationship target to a zip member name"""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(part_name), target))
+
+
+def read_relationships(zf: zipfile.ZipFile, part_name: str) -> Dict[str, Dict[str, str]]:
+    """
+    Read the internal relationships of a part
+
+    Returns:
+        Dictionary mapping rId to {'type': ..., 'target': zip member name}
+    """
+    try:
+        data = zf.read(_rels_name(part_name))
+    except KeyError:
+        return {}
+
+    relationships = {}
+    for rel in etree.fromstring(data).iter(RELATIONSHIP):
+        if rel.get('TargetMode') == 'External':
+            continue  # Linked images are not stored in the package
+        relationships[rel.get('Id')] = {
+            'type': rel.get('Type'),
+            'target': _resolve_target(part_name, rel.get('Target')),
+        }
+    return relationships
+
+
+def main_part_name(zf: zipfile.ZipFile) -> str:
+    """Name of the main document part, as declared in the package relationships"""
+    for rel in read_relationships(zf, '').values():
+        if rel['type'] == RT_OFFICE_DOCUMENT:
+            return rel['target']
+    return DEFAULT_MAIN_PART
+
+
+def story_part_names(zf: zipfile.ZipFile) -> List[str]:
+    """Main document part followed by its header and footer parts"""
+    main_part = main_part_name(zf)
+    related = read_relationships(zf, main_part).values()
+    headers_footers = sorted(
+        rel['target'] for rel in related if rel['type'] in (RT_HEADER, RT_FOOTER)
+    )
+    return [main_part] + headers_footers
+
+
+def _iter_part_images(zf: zipfile.ZipFile, part_name: str) -> Iterator[ImageLocation]:
+    """Incrementally parse one story part and yield its image references"""
+    relationships = None
+    paragraph_counter = 0
+    # One entry per open paragraph: [paragraph_index, run_count, current_run_index]
+    open_paragraphs = []
+
+    with zf.open(part_name) as stream:
+        for event, elem in etree.iterparse(stream, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag == W_P:
+                    open_paragraphs.append([paragraph_counter, 0, None])
+                    paragraph_counter += 1
+                elif tag == W_R and open_paragraphs:
+                    paragraph = open_paragraphs[-1]
+                    paragraph[2] = paragraph[1]
+                    paragraph[1] += 1
+                elif tag == A_BLIP and open_paragraphs:
+                    rel_id = elem.get(R_EMBED)
+                    if not rel_id:
+                        continue
+                    if relationships is None:
+                        relationships = read_relationships(zf, part_name)
+                    rel = relationships.get(rel_id)
+                    if rel is None:
+                        continue
+                    paragraph = open_paragraphs[-1]
+                    yield ImageLocation(part_name, paragraph[0], paragraph[2], rel_id, rel['target'])
+            else:
+                if tag == W_P:
+                    open_paragraphs.pop()
+                parent = elem.getparent()
+                if parent is not None and parent.tag in BLOCK_CONTAINERS:
+                    elem.clear()
+                    while elem.getprevious() is not None:
+                        del parent[0]
+
+
+def iter_image_locations(zf: zipfile.ZipFile) -> Iterator[ImageLocation]:
+    """
+    Yield the location of every embedded image in the document's story parts
+
+    Args:
+        zf: The .docx package opened as a ZipFile
+
+    Yields:
+        ImageLocation tuples in document order: main document first, then
+        headers and footers
+    """
+    for part_name in story_part_names(zf):
+        try:
+            zf.getinfo(part_name)
+        except KeyError:
+            continue
+        yield from _iter_part_images(zf, part_name)
+
+
+def iter_paragraphs(part_element) -> Iterator:
+    """Iterate over a loaded part's <w:p> elements in the order used by paragraph_index"""
+    return part_element.iter(W_P)
+
+
+def paragraph_runs(p_element) -> List:
+    """The <w:r> elements of a paragraph in the order used by run_index"""
+    runs = []
+    for r_element in p_element.iter(W_R):
+        ancestor = r_element.getparent()
+        while ancestor is not None and ancestor.tag != W_P:
+            ancestor = ancestor.getparent()
+        if ancestor is p_element:
+            runs.append(r_element)
+    return runs
@@ -10,9 +10,17 @@ backlog = 2048
 workers = 4  # Recommended: 2 * CPU cores + 1
 worker_class = "sync"
 worker_connections = 1000
-timeout = 1800  # 30 minutes - OCR processing for large documents (150+ images) can take 10-20 minutes
+# The web form and /api/jobs queue documents for the job threads, so requests are short.
+# Synchronous /api/process calls and streams get as long as Nginx waits (proxy_read_timeout);
+# a retry after a timeout resumes from the checkpoint. Send large documents to /api/jobs.
+timeout = 300
 keepalive = 2
 
+# Warm start: load the app once in the master and probe Tesseract there (see when_ready),
+# so forked workers inherit the loaded modules and probed engine copy-on-write
+# and serve their first request without setup. Code changes need a full restart, not a HUP.
+preload_app = True
+
 # Process naming
 proc_name = "image2text"
 
@@ -43,3 +51,19 @@ limit_request_field_size = 8190
 raw_env = [
     "FLASK_ENV=production",
 ]
+
+
+def when_ready(server):
+    """Probe Tesseract and its languages in the master, before the workers are forked"""
+    import gc
+    from ocr_processor import warm_up
+
+    try:
+        warm_up()
+    except Exception as e:
+        # Workers retry the probe themselves and report the error per request
+        server.log.error(f"Tesseract warm-up failed: {e}")
+
+    # Keep the objects created so far out of the collector's reach, so that
+    # collections in the workers don't write to (and un-share) their pages
+    gc.freeze()
@@ -0,0 +1,239 @@
+"""
+Perceptual near-duplicate detection for document images
+
+The same screenshot or diagram often appears several times in a document, or
+across a batch of documents, re-encoded at a different size or JPEG quality.
+A difference hash (dHash) of a small grayscale thumbnail is stable under those
+changes, so images whose hashes differ in only a small fraction of their edge
+bits can share a single OCR result.
+
+A hash match alone cannot tell "Invoice 0" from "Invoice 3", so every match
+is confirmed by comparing the two images' ink at the smaller image's
+resolution before the text is reused.
+"""
+import logging
+from typing import Callable, Dict, Hashable, Optional
+
+import numpy as np
+from PIL import Image
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = None) -> np.ndarray:
+    """
+    Compute the difference hash of an image
+    
+    Each horizontally adjacent pixel pair of a hash_size x hash_size grayscale
+    thumbnail contributes two bits: "gets brighter" and "gets darker" by more
+    than config.DEDUP_EDGE_DELTA. Flat regions therefore hash to zeros instead
+    of to noise, which keeps mostly-white images with a little text apart.
+
+    Args:
+        image: PIL Image object
+        hash_size: Side length of the thumbnail (default: config.DEDUP_HASH_SIZE)
+
+    Returns:
+        Packed hash bits as a uint8 array
+    """
+    hash_size = hash_size or config.DEDUP_HASH_SIZE
+
+    # Antialiased area resampling keeps the thumbnail stable across source sizes
+    thumbnail = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    gradient = pixels[:, 1:] - pixels[:, :-1]
+
+    delta = config.DEDUP_EDGE_DELTA
+    return np.packbits(np.concatenate([(gradient > delta).ravel(), (gradient < -delta).ravel()]))
+
+
+def hamming_distances(hashes: np.ndarray, image_hash: np.ndarray) -> np.ndarray:
+    """Number of differing bits between one hash and each row of a hash matrix"""
+    return np.unpackbits(np.bitwise_xor(hashes, image_hash), axis=1).sum(axis=1)
+
+
+def count_bits(image_hash: np.ndarray) -> int:
+    """Number of set bits in a packed hash"""
+    return int(np.unpackbits(image_hash).sum())
+
+
+def _ink_mask(image: Image.Image, size) -> np.ndarray:
+    """Pixels that clearly differ from the image's background level, at the given size"""
+    gray = image.convert('L')
+    if gray.size != size:
+        gray = gray.resize(size, Image.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.int16)
+    background = int(np.bincount(pixels.ravel(), minlength=256).argmax())
+    return np.abs(pixels - background) > config.DEDUP_VERIFY_INK_DELTA
+
+
+def images_match(first: Image.Image, second: Image.Image) -> bool:
+    """
+    Confirm that two images whose hashes match show the same content
+
+    Both images are compared at the smaller one's resolution. Resampling and
+    re-encoding only move ink boundaries by about a pixel, so the differing
+    ink pixels are eroded by one pixel; anything left is a real difference
+    such as a changed character.
+
+    Args:
+        first: PIL Image object
+        second: PIL Image object
+
+    Returns:
+        True if no more than config.DEDUP_VERIFY_MAX_PIXELS differences remain
+    """
+    size = min(first.size, second.size, key=lambda dims: dims[0] * dims[1])
+    differing = _ink_mask(first, size) ^ _ink_mask(second, size)
+
+    # 4-neighbour erosion
+    eroded = differing.copy()
+    eroded[1:, :] &= differing[:-1, :]
+    eroded[:-1, :] &= differing[1:, :]
+    eroded[:, 1:] &= differing[:, :-1]
+    eroded[:, :-1] &= differing[:, 1:]
+    return int(eroded.sum()) <= config.DEDUP_VERIFY_MAX_PIXELS
+
+
+class _HashGroups:
+    """Hashes and results of the group representatives for one set of OCR settings"""
+
+    def __init__(self, hash_bytes: int):
+        self.hashes = np.zeros((16, hash_bytes), dtype=np.uint8)
+        self.bit_counts = np.zeros(16, dtype=np.int64)
+        self.aspects = np.zeros(16, dtype=np.float64)
+        self.active = np.zeros(16, dtype=bool)
+        self.texts = []
+        self.sources = []
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, image_hash: np.ndarray, aspect: float) -> int:
+        count = len(self.texts)
+        if count == len(self.hashes):
+            self.hashes = np.concatenate([self.hashes, np.zeros_like(self.hashes)])
+            self.bit_counts = np.concatenate([self.bit_counts, np.zeros_like(self.bit_counts)])
+            self.aspects = np.concatenate([self.aspects, np.zeros_like(self.aspects)])
+            self.active = np.concatenate([self.active, np.zeros_like(self.active)])
+        self.hashes[count] = image_hash
+        self.bit_counts[count] = count_bits(image_hash)
+        self.aspects[count] = aspect
+        self.active[count] = True
+        self.texts.append(None)
+        self.sources.append(None)
+        return count
+
+
+class DuplicateIndex:
+    """
+    Groups near-identical images so that each group is OCR'd only once
+
+    One index can be shared across all documents of a batch. Groups are kept
+    separately per OCR settings, so text is only reused between images that
+    would have been OCR'd the same way.
+    """
+
+    def __init__(self, threshold: float = None, hash_size: int = None):
+        """
+        Initialize the index
+
+        Args:
+            threshold: Maximum fraction (0-1) of a hash's edge bits that may differ
+                       for two images to match (default: config.DEDUP_THRESHOLD)
+            hash_size: Side length of the hash thumbnail (default: config.DEDUP_HASH_SIZE)
+        """
+        self.threshold = threshold if threshold is not None else config.DEDUP_THRESHOLD
+        self.hash_size = hash_size or config.DEDUP_HASH_SIZE
+        self.ocr_calls_saved = 0
+        self._groups: Dict[Hashable, _HashGroups] = {}
+
+    def hash_image(self, image: Image.Image) -> np.ndarray:
+        """Compute the perceptual hash used by this index"""
+        return perceptual_hash(image, self.hash_size)
+
+    @staticmethod
+    def _aspect(image: Image.Image) -> float:
+        return image.width / image.height if image.height else 0.0
+
+    def find(self, image: Image.Image, image_hash: np.ndarray, namespace: Hashable = None) -> Optional[int]:
+        """
+        Find the group of a near-identical image seen before
+
+        Args:
+            image: PIL Image object
+            image_hash: Hash from hash_image()
+            namespace: OCR settings the image will be processed with
+
+        Returns:
+            Group id, or None if no earlier image is close enough
+        """
+        groups = self._groups.get(namespace)
+        if not groups:
+            return None
+
+        count = len(groups)
+        distances = hamming_distances(groups.hashes[:count], image_hash)
+        # Normalize by the number of edges so sparse images need a proportionally closer match
+        edges = np.maximum(groups.bit_counts[:count], count_bits(image_hash))
+        ratios = distances / np.maximum(edges, 1)
+
+        aspect = self._aspect(image)
+        # Re-encodes keep their shape; this stops e.g. a banner matching a square logo
+        aspect_ok = np.abs(groups.aspects[:count] - aspect) <= config.DEDUP_MAX_ASPECT_DIFF * max(aspect, 1e-6)
+        candidates = np.flatnonzero((ratios <= self.threshold) & aspect_ok & groups.active[:count])
+        for candidate in candidates[np.argsort(ratios[candidates], kind='stable')]:
+            if self._verify(groups.sources[candidate], image):
+                return int(candidate)
+        return None
+
+    @staticmethod
+    def _verify(source: Optional[Callable[[], Image.Image]], image: Image.Image) -> bool:
+        """Pixel-level check against a group's representative (hash match only if it has no source)"""
+        if source is None:
+            return True
+        try:
+            return images_match(source(), image)
+        except Exception as e:
+            logger.warning(f"Could not load duplicate group representative: {e}")
+            return False
+
+    def add(self, image: Image.Image, image_hash: np.ndarray, namespace: Hashable = None,
+            text: str = None, source: Callable[[], Image.Image] = None) -> int:
+        """
+        Start a new group represented by this image
+
+        Args:
+            image: PIL Image object
+            image_hash: Hash from hash_image()
+            namespace: OCR settings the image will be processed with
+            text: OCR result, if already known
+            source: Returns the image again for verifying later matches, so
+                    that the index does not have to keep pixel data in memory
+
+        Returns:
+            Group id
+        """
+        groups = self._groups.get(namespace)
+        if groups is None:
+            groups = self._groups[namespace] = _HashGroups(len(image_hash))
+        group = groups.add(image_hash, self._aspect(image))
+        groups.texts[group] = text
+        groups.sources[group] = source
+        return group
+
+    def set_text(self, group: int, text: str, namespace: Hashable = None):
+        """Record the OCR result of a group's representative image"""
+        self._groups[namespace].texts[group] = text
+
+    def get_text(self, group: int, namespace: Hashable = None) -> Optional[str]:
+        """Get the OCR result of a group, or None if it has not been OCR'd yet"""
+        return self._groups[namespace].texts[group]
+
+    def discard(self, group: int, namespace: Hashable = None):
+        """Stop matching images against a group, e.g. because its representative's OCR failed"""
+        groups = self._groups[namespace]
+        groups.active[group] = False
+        groups.sources[group] = None
@@ -2,39 +2,110 @@
 Image extraction utilities for Word documents
 """
 import io
-from typing import List, Tuple
+import threading
+import zipfile
+from functools import partial
+from typing import Callable, Iterator, List, Optional, Tuple
 from docx import Document
-from docx.oxml import parse_xml
-from docx.oxml.ns import qn
 from PIL import Image
 import logging
+from docx_scanner import DEFAULT_MAIN_PART, iter_image_locations
 
 logger = logging.getLogger(__name__)
 
 
+def read_zip_member(doc_path, name: str) -> bytes:
+    """Read one member of a .docx package without keeping the package open"""
+    with zipfile.ZipFile(doc_path) as zf:
+        return zf.read(name)
+
+
+def _decode_image(read: Callable[[], bytes]) -> Image.Image:
+    return Image.open(io.BytesIO(read()))
+
+
 class ImageInfo:
-    """Class to store information about an image in the document"""
+    """
+    Class to store information about an image in the document
+    
+    Records are kept small (no __dict__, no data until it is asked for) so
+    that a whole document's worth can be held while only a few images are
+    decoded at a time. Image bytes come either from image_data or, lazily,
+    from a loader; release() drops them again once OCR is done.
+    """
     
-    def __init__(self, image_data: bytes, image_id: str, paragraph_index: int, run_index: int):
-        self.image_data = image_data
+    __slots__ = ('image_id', 'paragraph_index', 'run_index', 'part_name',
+                 '_image_data', '_loader', '_location', '_pil_image')
+    
+    def __init__(self, image_data: Optional[bytes], image_id: str, paragraph_index: int, run_index: int,
+                 part_name: str = DEFAULT_MAIN_PART, loader: Callable[[], bytes] = None,
+                 location: Tuple = None):
+        """
+        Args:
+            location: (docx path or file, package member) the image can be
+                      read back from independently of the extractor
+        """
         self.image_id = image_id
         self.paragraph_index = paragraph_index
         self.run_index = run_index
-        self.pil_image = None
+        self.part_name = part_name
+        self._image_data = image_data
+        self._loader = loader
+        self._location = location
+        self._pil_image = None
+    
+    @property
+    def image_data(self) -> bytes:
+        """Raw image bytes, read from the package on first access"""
+        if self._image_data is None:
+            if self._loader is None:
+                raise ValueError(f"No image data for {self.image_id}")
+            self._image_data = self._loader()
+        return self._image_data
         
     def to_pil_image(self) -> Image.Image:
-        """Convert image data to PIL Image"""
-        if self.pil_image is None:
-            self.pil_image = Image.open(io.BytesIO(self.image_data))
-        return self.pil_image
+        """Convert image data to PIL Image (decoded once until release())"""
+        if self._pil_image is None:
+            self._pil_image = Image.open(io.BytesIO(self.image_data))
+        return self._pil_image
+    
+    def reloader(self) -> Callable[[], Image.Image]:
+        """
+        A function that decodes the image again, for keeping past the document
+        
+        It holds only the package location (or, without one, the raw bytes),
+        not this record or the extractor, so holding it for a whole batch
+        (as a shared DuplicateIndex does) keeps no document in memory.
+        """
+        if self._location is not None:
+            return partial(_decode_image, partial(read_zip_member, *self._location))
+        return partial(_decode_image, partial(bytes, self.image_data))
+    
+    def release(self):
+        """
+        Drop the decoded image and, if they can be reloaded, the raw bytes
+        
+        Position information is kept, so released records can still be
+        used to reconstruct the document.
+        """
+        self._pil_image = None
+        if self._loader is not None:
+            self._image_data = None
 
 
 class ImageExtractor:
     """Extract images from Word documents"""
     
-    def __init__(self, doc_path: str):
+    def __init__(self, doc_path):
+        """
+        Args:
+            doc_path: Path to the .docx file, or a seekable binary file
+                      holding it (e.g. an upload kept in memory)
+        """
         self.doc_path = doc_path
         self.document = None
+        self._package = None
+        self._package_lock = threading.Lock()
         
     def load_document(self) -> Document:
         """Load the Word document"""
@@ -46,56 +117,81 @@ class ImageExtractor:
             logger.error(f"Failed to load document: {e}")
             raise
     
-    def extract_images(self) -> List[ImageInfo]:
+    def _open_package(self) -> zipfile.ZipFile:
+        """The .docx package, opened once and shared by all image loaders"""
+        with self._package_lock:
+            if self._package is None:
+                self._package = zipfile.ZipFile(self.doc_path)
+            return self._package
+    
+    def _read_member(self, name: str) -> bytes:
+        with self._package_lock:
+            package = self._package
+        if package is not None:
+            return package.read(name)
+        # Closed after extraction: read without keeping the file open
+        return read_zip_member(self.doc_path, name)
+    
+    def iter_images(self) -> Iterator[ImageInfo]:
         """
-        Extract all images from the document with their positions
+        Yield the document's images with their positions, in document order
         
-        Returns:
-            List of ImageInfo objects containing image data and position information
+        Images are found by streaming the document's XML parts straight out
+        of the .docx package (see docx_scanner), which covers tables, text
+        boxes, headers and footers without loading the python-docx object
+        model. Image bytes are not read here: each ImageInfo loads its own
+        data on first use and can drop it again with release().
+        
+        Yields:
+            ImageInfo objects containing position information
         """
-        if self.document is None:
-            self.load_document()
+        try:
+            zf = self._open_package()
+        except Exception as e:
+            logger.error(f"Failed to open document: {e}")
+            raise
         
-        images = []
         image_counter = 0
+        for location in iter_image_locations(zf):
+            try:
+                zf.getinfo(location.target)
+            except KeyError:
+                logger.warning(f"Failed to extract image with rId {location.rel_id}: "
+                               f"{location.target} is missing from the package")
+                continue
+            
+            yield ImageInfo(
+                image_data=None,
+                image_id=f"image_{image_counter}",
+                paragraph_index=location.paragraph_index,
+                run_index=location.run_index,
+                part_name=location.part_name,
+                loader=partial(self._read_member, location.target),
+                location=(self.doc_path, location.target)
+            )
+            image_counter += 1
+            logger.info(f"Found image {image_counter} in paragraph "
+                        f"{location.paragraph_index} of {location.part_name}")
+    
+    def extract_images(self) -> List[ImageInfo]:
+        """
+        Extract all images from the document with their positions
         
-        # Iterate through all paragraphs
-        for para_idx, paragraph in enumerate(self.document.paragraphs):
-            # Iterate through all runs in the paragraph
-            for run_idx, run in enumerate(paragraph.runs):
-                # Check if run contains an image
-                inline_shapes = run._element.findall(qn('w:drawing'))
-                
-                for drawing in inline_shapes:
-                    # Get the image relationship ID
-                    blips = drawing.findall('.//' + qn('a:blip'))
-                    
-                    for blip in blips:
-                        rId = blip.get(qn('r:embed'))
-                        if rId:
-                            try:
-                                # Get the image from the document's part
-                                image_part = self.document.part.related_parts[rId]
-                                image_data = image_part.blob
-                                
-                                # Create ImageInfo object
-                                image_info = ImageInfo(
-                                    image_data=image_data,
-                                    image_id=f"image_{image_counter}",
-                                    paragraph_index=para_idx,
-                                    run_index=run_idx
-                                )
-                                
-                                images.append(image_info)
-                                image_counter += 1
-                                logger.info(f"Extracted image {image_counter} from paragraph {para_idx}")
-                                
-                            except Exception as e:
-                                logger.warning(f"Failed to extract image with rId {rId}: {e}")
-        
+        Returns:
+            List of ImageInfo objects containing position information; see
+            iter_images()
+        """
+        images = list(self.iter_images())
         logger.info(f"Total images extracted: {len(images)}")
         return images
     
+    def close(self):
+        """Close the .docx package (image loaders reopen it if used again)"""
+        with self._package_lock:
+            if self._package is not None:
+                self._package.close()
+                self._package = None
+    
     def get_document(self) -> Document:
         """Get the loaded document"""
         if self.document is None:
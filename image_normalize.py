@@ -0,0 +1,209 @@
+"""
+Image geometry normalization before OCR
+
+Document images arrive at whatever resolution they were pasted in: phone
+photos of whiteboards at 6000x4000, screenshots of a dialog at 300x80.
+Tesseract's speed and accuracy depend on the size of the text, not of the
+image, so images are normalized before OCR:
+
+1. draft_decode(): large JPEGs whose text is bigger than needed are decoded
+   at 1/2, 1/4 or 1/8 scale by libjpeg itself, which is much cheaper than
+   decoding at full size and resizing
+2. normalize_for_ocr(): uniform margins are cropped to the bounding box of
+   the ink, then the image is rescaled so that a line of text is about
+   config.NORMALIZE_TARGET_LINE_HEIGHT pixels tall
+
+Line height is measured from the horizontal projection profile: the median
+height of the bands of rows that contain ink. The same profile is used by
+split_into_bands() to cut very large images at whitespace gaps, so that the
+pieces can be OCR'd in parallel.
+"""
+import io
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def signature() -> str:
+    """Settings that affect OCR output, for building cache keys"""
+    if not config.NORMALIZE_ENABLED:
+        return ''
+    settings = (config.NORMALIZE_DRAFT_MIN_SIDE, config.NORMALIZE_MAX_SIDE, config.NORMALIZE_CROP_PADDING,
+                config.NORMALIZE_INK_DELTA, config.NORMALIZE_TARGET_LINE_HEIGHT, config.NORMALIZE_MIN_SCALE,
+                config.NORMALIZE_MAX_SCALE, config.NORMALIZE_SCALE_TOLERANCE)
+    return 'normalize:' + ':'.join(str(value) for value in settings)
+
+
+def _ink_mask(image: Image.Image) -> Image.Image:
+    """Pixels that clearly differ from the most common (background) level, as a mode 'L' mask"""
+    gray = image.convert('L')
+    histogram = gray.histogram()
+    background = histogram.index(max(histogram))
+    # A lookup table keeps this in C, which matters for 20+ megapixel photos
+    table = [255 if abs(value - background) > config.NORMALIZE_INK_DELTA else 0 for value in range(256)]
+    return gray.point(table)
+
+
+def _row_runs(rows: np.ndarray) -> np.ndarray:
+    """Lengths of the runs of True values in a 1-D boolean array"""
+    padded = np.concatenate([[False], rows, [False]]).astype(np.int8)
+    boundaries = np.diff(padded)
+    return np.flatnonzero(boundaries == -1) - np.flatnonzero(boundaries == 1)
+
+
+def text_geometry(image: Image.Image) -> Optional[Tuple[Tuple[int, int, int, int], np.ndarray]]:
+    """
+    Find the ink of an image
+
+    Args:
+        image: PIL Image object
+
+    Returns:
+        (crop_box, line_bands): the bounding box of the ink plus
+        config.NORMALIZE_CROP_PADDING, and the heights of the bands of rows
+        containing ink inside it; None for a blank image
+    """
+    mask = _ink_mask(image)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return None
+
+    padding = config.NORMALIZE_CROP_PADDING
+    left, top, right, bottom = bbox
+    crop_box = (max(0, left - padding), max(0, top - padding),
+                min(image.width, right + padding), min(image.height, bottom + padding))
+    line_bands = _row_runs(np.asarray(mask.crop(crop_box)).any(axis=1))
+    return crop_box, line_bands
+
+
+def draft_decode(image: Image.Image, image_data: bytes) -> Image.Image:
+    """
+    Ask the decoder for a reduced-size image if its text is larger than needed
+
+    Only has an effect on large JPEG images that have not been loaded yet.
+    A 1/8 scale probe decode (a few milliseconds) measures the line height,
+    and the image is then decoded at the smallest 1/2, 1/4 or 1/8 scale that
+    keeps lines at least config.NORMALIZE_TARGET_LINE_HEIGHT pixels tall.
+
+    Args:
+        image: PIL Image object, as returned by Image.open()
+        image_data: The encoded image, for the probe decode
+
+    Returns:
+        The same image object
+    """
+    if image.format != 'JPEG' or max(image.size) <= config.NORMALIZE_DRAFT_MIN_SIDE:
+        return image
+
+    try:
+        probe = Image.open(io.BytesIO(image_data))
+        probe.draft('L', (-(-image.width // 8), -(-image.height // 8)))
+        geometry = text_geometry(probe)
+    except Exception as e:
+        logger.debug(f"Draft decoding probe failed: {e}")
+        return image
+    if geometry is None or len(geometry[1]) < 2:
+        return image  # No measurable lines of text
+
+    line_height = float(np.median(geometry[1])) * image.width / probe.width
+    factor = 1
+    while factor < 8 and line_height / (factor * 2) >= config.NORMALIZE_TARGET_LINE_HEIGHT:
+        factor *= 2
+    if factor == 1:
+        return image
+
+    original = image.size
+    image.draft(image.mode, (-(-image.width // factor), -(-image.height // factor)))
+    logger.debug(f"Draft decoding {original[0]}x{original[1]} image at {image.width}x{image.height}")
+    return image
+
+
+def normalize_for_ocr(image: Image.Image) -> Image.Image:
+    """
+    Crop uniform margins and rescale an image to the text size Tesseract works best at
+
+    Args:
+        image: PIL Image object
+
+    Returns:
+        Normalized PIL Image (the input image if nothing needed to change)
+    """
+    geometry = text_geometry(image)
+    if geometry is None:
+        return image  # Blank image; nothing to crop or measure
+
+    crop_box, line_bands = geometry
+    if crop_box != (0, 0, image.width, image.height):
+        image = image.crop(crop_box)
+
+    scale = config.NORMALIZE_TARGET_LINE_HEIGHT / float(np.median(line_bands))
+    if scale < 1 and len(line_bands) < 2:
+        # A single band may be one big line or a graphic without line
+        # structure; only shrink images where separate lines were found
+        scale = 1.0
+    scale = min(max(scale, config.NORMALIZE_MIN_SCALE), config.NORMALIZE_MAX_SCALE)
+    if scale > 1:
+        scale = max(1.0, min(scale, config.NORMALIZE_MAX_SIDE / max(image.size)))
+
+    # Small changes cost a resample without helping Tesseract
+    if 1 / config.NORMALIZE_SCALE_TOLERANCE <= scale <= config.NORMALIZE_SCALE_TOLERANCE:
+        return image
+
+    # Palette and bilevel images would be resampled with nearest neighbour
+    if image.mode == 'P':
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    elif image.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+        image = image.convert('L')
+
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    # reducing_gap does most of a large reduction with a cheap box filter first
+    return image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+
+def split_into_bands(image: Image.Image, bands: int) -> List[Image.Image]:
+    """
+    Split an image into horizontal bands at whitespace gaps
+
+    Cuts are made in the middle of the blank row gap nearest to each of the
+    evenly spaced target positions, so no line of text is ever cut. Gaps are
+    rows without ink across the whole width.
+
+    Args:
+        image: PIL Image object
+        bands: Number of bands wanted
+
+    Returns:
+        The bands from top to bottom (fewer than requested if there are not
+        enough gaps; just [image] if there are none)
+    """
+    if bands < 2:
+        return [image]
+
+    blank = ~np.asarray(_ink_mask(image)).any(axis=1)
+    padded = np.concatenate([[False], blank, [False]]).astype(np.int8)
+    boundaries = np.diff(padded)
+    gap_starts = np.flatnonzero(boundaries == 1)
+    gap_ends = np.flatnonzero(boundaries == -1)
+
+    # Gaps at the very top or bottom are margins, not separators
+    inner = (gap_starts > 0) & (gap_ends < image.height)
+    centers = ((gap_starts + gap_ends) // 2)[inner]
+    if not len(centers):
+        return [image]
+
+    # Nearest gap to each target, within half a band of it
+    band_height = image.height / bands
+    cuts = []
+    for target in (band_height * idx for idx in range(1, bands)):
+        nearest = centers[np.argmin(np.abs(centers - target))]
+        if abs(nearest - target) <= band_height / 2 and (not cuts or nearest > cuts[-1]):
+            cuts.append(int(nearest))
+
+    edges = [0] + cuts + [image.height]
+    return [image.crop((0, top, image.width, bottom)) for top, bottom in zip(edges, edges[1:])]
@@ -0,0 +1,177 @@
+"""
+Background cleanup of the web application's upload and output folders
+
+One janitor thread runs in every gunicorn worker, but a sweep only happens
+in the worker that takes an exclusive lock on config.JANITOR_LOCK_PATH, and
+only if no worker has swept within config.JANITOR_INTERVAL (the lock file
+holds the time of the last sweep). Requests never pay for cleanup.
+
+A sweep removes files older than config.JANITOR_MAX_AGE_HOURS, then, if the
+folders still hold more than config.JANITOR_MAX_BYTES, evicts the oldest
+files until they fit. Files younger than config.JANITOR_MIN_AGE and files
+that a caller-supplied function reports as in use (inputs of queued jobs)
+are never evicted.
+"""
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Set
+
+try:
+    import fcntl  # Not available on Windows
+except ImportError:
+    fcntl = None
+
+import config
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Janitor:
+    """Age- and quota-based cleanup of folders, coordinated across processes"""
+
+    def __init__(self, folders: Iterable[Path], in_use: Callable[[], Set[str]] = None,
+                 lock_path: str = None):
+        """
+        Initialize the janitor
+
+        Args:
+            folders: Folders whose files are cleaned up
+            in_use: Returns the paths of files that must not be removed
+            lock_path: Lock file shared by all processes (default: config.JANITOR_LOCK_PATH)
+        """
+        self.folders = [Path(folder) for folder in folders]
+        self.in_use = in_use
+        self.lock_path = Path(lock_path or config.JANITOR_LOCK_PATH)
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _files(self) -> List[os.DirEntry]:
+        entries = []
+        for folder in self.folders:
+            try:
+                entries.extend(entry for entry in os.scandir(folder) if entry.is_file())
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def sweep(self) -> Dict[str, Dict[str, int]]:
+        """
+        Remove expired files, then the oldest files until the quota is met
+
+        Returns:
+            Files removed and bytes reclaimed, by reason ('age' or 'quota')
+        """
+        now = time.time()
+        max_age = config.JANITOR_MAX_AGE_HOURS * 3600
+        protected = {str(Path(path).resolve()) for path in self.in_use()} if self.in_use else set()
+        reclaimed = {reason: {'files': 0, 'bytes': 0} for reason in ('age', 'quota')}
+
+        files = []
+        for entry in self._files():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Removed by someone else since the listing
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        def remove(path: str, size: int, reason: str) -> bool:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                return True
+            except OSError as e:
+                logger.error(f"Failed to delete {path}: {e}")
+                return False
+            reclaimed[reason]['files'] += 1
+            reclaimed[reason]['bytes'] += size
+            return True
+
+        kept = []
+        for mtime, size, path in files:
+            if now - mtime > max_age and str(Path(path).resolve()) not in protected:
+                if remove(path, size, 'age'):
+                    continue
+            kept.append((mtime, size, path))
+
+        # Oldest first until the folders fit the quota
+        total = sum(size for _, size, _ in kept)
+        for mtime, size, path in sorted(kept):
+            if total <= config.JANITOR_MAX_BYTES:
+                break
+            if now - mtime < config.JANITOR_MIN_AGE or str(Path(path).resolve()) in protected:
+                continue
+            if remove(path, size, 'quota'):
+                total -= size
+        if total > config.JANITOR_MAX_BYTES:
+            logger.warning(f"Upload and output folders hold {total / 1024 ** 2:.0f} MB, over the "
+                           f"{config.JANITOR_MAX_BYTES / 1024 ** 2:.0f} MB quota, but the rest is recent or in use")
+
+        metrics = get_metrics()
+        for reason, counts in reclaimed.items():
+            metrics.inc('janitor_files_removed_total', counts['files'], reason=reason)
+            metrics.inc('janitor_bytes_reclaimed_total', counts['bytes'], reason=reason)
+        if reclaimed['age']['files'] or reclaimed['quota']['files']:
+            logger.info(f"Janitor removed {reclaimed['age']['files']} expired and "
+                        f"{reclaimed['quota']['files']} files over quota, reclaiming "
+                        f"{(reclaimed['age']['bytes'] + reclaimed['quota']['bytes']) / 1024 ** 2:.1f} MB "
+                        f"({total / 1024 ** 2:.1f} MB left)")
+        return reclaimed
+
+    def run_if_due(self) -> bool:
+        """
+        Sweep if this process gets the lock and no process swept recently
+
+        Returns:
+            True if a sweep ran
+        """
+        with open(self.lock_path, 'a+') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False  # Another worker is sweeping
+            try:
+                lock_file.seek(0)
+                try:
+                    last_sweep = float(lock_file.read() or 0)
+                except ValueError:
+                    last_sweep = 0
+                if time.time() - last_sweep < config.JANITOR_INTERVAL:
+                    return False
+                self.sweep()
+                lock_file.truncate(0)
+                lock_file.write(repr(time.time()))
+                lock_file.flush()
+                return True
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def start(self):
+        """
+        Start this process's janitor thread (no-op if already running)
+
+        Safe to call on every request, like JobQueue.start().
+        """
+        if self._started_pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            threading.Thread(target=self._loop, name='janitor', daemon=True).start()
+
+    def _loop(self):
+        while True:
+            try:
+                self.run_if_due()
+            except Exception as e:
+                logger.error(f"Janitor sweep failed: {e}")
+            time.sleep(config.JANITOR_INTERVAL)
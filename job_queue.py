@@ -0,0 +1,274 @@
+"""
+Persistent background job queue for the web application
+
+Jobs are stored in a SQLite database (WAL mode) shared by all gunicorn
+workers, so a submitted job survives a worker restart. Each worker process
+runs a small pool of threads that claim queued jobs one at a time. Jobs left
+'running' by a process that no longer exists are put back in the queue.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import config
+from process_utils import pid_alive
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    options TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+"""
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds the maximum number of waiting jobs"""
+
+
+class JobQueue:
+    """SQLite-backed job queue with a per-process pool of worker threads"""
+
+    def __init__(self, path: str = None, max_depth: int = None, workers: int = None):
+        """
+        Initialize the queue
+
+        Args:
+            path: Path to the SQLite database file
+            max_depth: Maximum number of queued (not yet running) jobs
+            workers: Worker threads per process
+        """
+        self.path = Path(path or config.JOB_QUEUE_PATH)
+        self.max_depth = max_depth or config.JOB_QUEUE_MAX_DEPTH
+        self.workers = workers or config.JOB_WORKERS
+        self._local = threading.local()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get a connection for the current thread and process"""
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def submit(self, options: Dict) -> str:
+        """
+        Add a job to the queue
+
+        Args:
+            options: JSON-serializable job parameters passed to the handler
+
+        Returns:
+            The new job id
+
+        Raises:
+            QueueFullError: If max_depth jobs are already waiting
+        """
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            if depth >= self.max_depth:
+                raise QueueFullError(f"Job queue is full ({depth} jobs waiting)")
+            conn.execute(
+                "INSERT INTO jobs (id, status, options, created) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(options), time.time())
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        self._wakeup.set()
+        logger.info(f"Queued job {job_id} ({depth + 1} waiting)")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a job's status and result, or None if it does not exist"""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        if job['status'] == QUEUED:
+            job['position'] = self._connect().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND created <= ?",
+                (QUEUED, job['created'])
+            ).fetchone()[0]
+        return job
+
+    def depth(self) -> int:
+        """Number of jobs waiting to run"""
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)
+        ).fetchone()[0]
+
+    def _claim(self) -> Optional[Dict]:
+        """Atomically move the oldest queued job to running"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT id, options FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker_pid = ?, started = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (RUNNING, os.getpid(), time.time(), row['id'])
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        if row is None:
+            return None
+        return {'id': row['id'], 'options': json.loads(row['options'])}
+
+    def _finish(self, job_id: str, result: Dict = None, error: str = None):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?",
+            (FAILED if error else DONE, json.dumps(result) if result is not None else None,
+             error, time.time(), job_id)
+        )
+
+    def recover(self) -> int:
+        """
+        Requeue jobs whose worker process has died
+
+        Jobs that have already been attempted config.JOB_MAX_ATTEMPTS times
+        are marked failed instead, so a document that crashes its worker
+        cannot take the service down in a loop.
+
+        Returns:
+            Number of jobs requeued or failed
+        """
+        conn = self._connect()
+        recovered = 0
+        for row in conn.execute(
+                "SELECT id, worker_pid, attempts FROM jobs WHERE status = ?", (RUNNING,)).fetchall():
+            if row['worker_pid'] and pid_alive(row['worker_pid']):
+                continue
+            if row['attempts'] >= config.JOB_MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ? AND status = ?",
+                    (FAILED, 'Worker stopped while processing the job', time.time(), row['id'], RUNNING)
+                )
+                logger.warning(f"Job {row['id']} failed after {row['attempts']} attempts")
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker_pid = NULL WHERE id = ? AND status = ?",
+                    (QUEUED, row['id'], RUNNING)
+                )
+                logger.warning(f"Requeued job {row['id']} from stopped worker {row['worker_pid']}")
+            recovered += 1
+        return recovered
+
+    def active_inputs(self) -> set:
+        """Input paths of the jobs that are queued or running"""
+        rows = self._connect().execute(
+            "SELECT options FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchall()
+        return {json.loads(row['options'])['input_path'] for row in rows}
+
+    def purge_finished(self, max_age_hours: float = None) -> int:
+        """Delete finished jobs older than max_age_hours"""
+        max_age_hours = max_age_hours or config.JOB_RETENTION_HOURS
+        cutoff = time.time() - max_age_hours * 3600
+        return self._connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?", (DONE, FAILED, cutoff)
+        ).rowcount
+
+    def start(self, handler: Callable[[Dict], Dict]):
+        """
+        Start the worker threads of this process (no-op if already running)
+
+        Safe to call on every request: threads do not survive a fork, so the
+        pool is started lazily in each worker process rather than at import.
+
+        Args:
+            handler: Called with a job's options; returns the result dict or raises
+        """
+        if self._started_pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._wakeup = threading.Event()
+
+            try:
+                self.recover()
+                self.purge_finished()
+            except sqlite3.Error as e:
+                logger.error(f"Job queue recovery failed: {e}")
+
+            for idx in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker_loop, args=(handler,),
+                    name=f"job-worker-{idx}", daemon=True
+                )
+                thread.start()
+            logger.info(f"Started {self.workers} job worker threads in process {os.getpid()}")
+
+    def _worker_loop(self, handler: Callable[[Dict], Dict]):
+        last_recovery = time.time()
+        while True:
+            try:
+                if time.time() - last_recovery > config.JOB_RECOVERY_INTERVAL:
+                    self.recover()
+                    last_recovery = time.time()
+
+                job = self._claim()
+                if job is None:
+                    # Other processes' submissions are only seen by polling
+                    self._wakeup.wait(config.JOB_POLL_INTERVAL)
+                    self._wakeup.clear()
+                    continue
+
+                logger.info(f"Running job {job['id']}")
+                try:
+                    result = handler(job['options'])
+                except Exception as e:
+                    logger.error(f"Job {job['id']} failed: {e}")
+                    self._finish(job['id'], error=str(e))
+                else:
+                    self._finish(job['id'], result=result)
+                    logger.info(f"Finished job {job['id']}")
+            except sqlite3.Error as e:
+                logger.error(f"Job queue error: {e}")
+                time.sleep(config.JOB_POLL_INTERVAL)
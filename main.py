@@ -7,12 +7,11 @@ import argparse
 import logging
 import sys
 import os
+import time
 from pathlib import Path
 
-from image_extractor import ImageExtractor
-from ocr_processor import OCRProcessor
-from document_processor import DocumentProcessor
 import config
+import text_export
 
 
 def setup_logging(log_level: str = None):
@@ -29,16 +28,31 @@ def setup_logging(log_level: str = None):
 
 
 def process_document(input_path: str, output_path: str = None, text_placement: str = None, 
-                     lang: str = None, enhanced: bool = False):
+                     lang: str = None, enhanced: bool = False, workers: int = None,
+                     dedup_index=None, timings: dict = None, profile=None,
+                     output_format: str = text_export.DOCX):
     """
     Process a Word document to extract text from images
     
     Args:
         input_path: Path to input .docx file
-        output_path: Path to output .docx file (optional)
+        output_path: Path to output file (optional, default: input_processed.<format>)
         text_placement: 'below' or 'replace'
         lang: OCR language code
         enhanced: Use enhanced OCR with preprocessing
+        workers: Number of images to OCR in parallel (default: config.OCR_WORKERS)
+        dedup_index: image_dedup.DuplicateIndex shared across documents (optional)
+        timings: Optional dictionary that receives the number of images
+                 found as 'images' (0 when False is returned for a document
+                 without images), the seconds spent in each stage (extract,
+                 ocr, reconstruct, save), the OCR counters as 'ocr_stats'
+                 and the OCR milliseconds of each image as 'image_ms'
+        profile: profiler.DocumentProfile to fill; the report is written
+                 next to the output document (optional)
+        output_format: 'docx' to write the document with the text inserted,
+                       or 'json', 'jsonl' or 'txt' to write only each image's
+                       text and position (see text_export), which skips
+                       rebuilding and saving the document
     """
     logger = logging.getLogger(__name__)
     
@@ -51,19 +65,56 @@ def process_document(input_path: str, output_path: str = None, text_placement: s
         logger.error("Input file must be a .docx file")
         return False
     
+    if output_format not in text_export.FORMATS:
+        logger.error(f"Unknown output format '{output_format}'. Choose from: {', '.join(text_export.FORMATS)}")
+        return False
+    
     # Set output path if not provided
     if output_path is None:
         input_file = Path(input_path)
-        output_path = str(input_file.parent / f"{input_file.stem}_processed.docx")
+        output_path = str(input_file.parent / f"{input_file.stem}_processed.{output_format}")
     
     logger.info(f"Processing document: {input_path}")
     logger.info(f"Output will be saved to: {output_path}")
     
+    if profile is not None:
+        with profile.capture():
+            success = _process_document(input_path, output_path, text_placement, lang, enhanced,
+                                        workers, dedup_index, timings, profile, output_format)
+        try:
+            for path in profile.write(output_path):
+                logger.info(f"Profile report written to: {path}")
+        except OSError as e:
+            logger.error(f"Failed to write profile report: {e}")
+        return success
+    
+    return _process_document(input_path, output_path, text_placement, lang, enhanced,
+                             workers, dedup_index, timings, profile, output_format)
+
+
+def _process_document(input_path, output_path, text_placement, lang, enhanced, workers,
+                      dedup_index, timings, profile, output_format) -> bool:
+    """The processing steps of process_document, once the paths are validated"""
+    # Imported here rather than at the top so that --help and argument errors don't
+    # wait for python-docx, Pillow, NumPy and pytesseract to load
+    from image_extractor import ImageExtractor
+    from ocr_processor import get_ocr_processor
+    from document_processor import DocumentProcessor
+    from checkpoint import document_digest
+    
+    logger = logging.getLogger(__name__)
+    
     try:
+        stage_seconds = {}
+        
         # Step 1: Extract images from document
         logger.info("Step 1: Extracting images from document...")
+        start = time.perf_counter()
         extractor = ImageExtractor(input_path)
         images = extractor.extract_images()
+        stage_seconds['extract'] = time.perf_counter() - start
+        if timings is not None:
+            timings['images'] = len(images)
         
         if not images:
             logger.warning("No images found in the document")
@@ -73,47 +124,61 @@ def process_document(input_path: str, output_path: str = None, text_placement: s
         
         # Step 2: Perform OCR on each image
         logger.info("Step 2: Performing OCR on images...")
-        ocr = OCRProcessor(lang=lang)
-        image_texts = {}
+        start = time.perf_counter()
+        ocr = get_ocr_processor(lang=lang)
+        # Images finished by an earlier, interrupted attempt at this document are not OCR'd again
+        checkpoint = ocr.open_checkpoint(document_digest(input_path), enhanced)
+        ocr_stats = {}
+        try:
+            image_texts = ocr.extract_text_from_images(images, enhanced=enhanced, workers=workers,
+                                                       dedup_index=dedup_index, stats=ocr_stats,
+                                                       on_record=profile.add_image if profile else None,
+                                                       checkpoint=checkpoint)
+        finally:
+            extractor.close()
+            if checkpoint is not None:
+                checkpoint.close()
+        stage_seconds['ocr'] = time.perf_counter() - start
         
-        for idx, img_info in enumerate(images, 1):
-            logger.info(f"Processing image {idx}/{len(images)} - {img_info.image_id}")
-            
-            pil_image = img_info.to_pil_image()
-            
-            # Check minimum image size
-            if (pil_image.width < config.MIN_IMAGE_SIZE[0] or 
-                pil_image.height < config.MIN_IMAGE_SIZE[1]):
-                logger.warning(f"Image {img_info.image_id} is too small, skipping")
-                continue
-            
-            # Extract text
-            if enhanced:
-                text = ocr.extract_text_enhanced(pil_image)
-            else:
-                text = ocr.extract_text(pil_image)
+        if output_format != text_export.DOCX:
+            # Text only: the document is never loaded into python-docx or rebuilt
+            logger.info(f"Step 3: Writing extracted text as {output_format}...")
+            start = time.perf_counter()
+            text_export.write(output_path, output_format, Path(input_path).name,
+                              text_export.image_entries(images, image_texts))
+        else:
+            # Step 3: Reconstruct document with extracted text
+            logger.info("Step 3: Reconstructing document with extracted text...")
+            start = time.perf_counter()
+            document = extractor.get_document()
+            processor = DocumentProcessor(document, text_placement=text_placement)
+            processor.add_text_to_document(image_texts, images)
+            stage_seconds['reconstruct'] = time.perf_counter() - start
             
-            image_texts[img_info.image_id] = text
-            
-            if text:
-                logger.info(f"Extracted {len(text)} characters from {img_info.image_id}")
-            else:
-                logger.warning(f"No text extracted from {img_info.image_id}")
-        
-        # Step 3: Reconstruct document with extracted text
-        logger.info("Step 3: Reconstructing document with extracted text...")
-        document = extractor.get_document()
-        processor = DocumentProcessor(document, text_placement=text_placement)
-        processor.add_text_to_document(image_texts, images)
+            # Step 4: Save the modified document
+            logger.info("Step 4: Saving modified document...")
+            start = time.perf_counter()
+            processor.save_document(output_path)
+        if checkpoint is not None:
+            checkpoint.complete()
+        stage_seconds['save'] = time.perf_counter() - start
         
-        # Step 4: Save the modified document
-        logger.info("Step 4: Saving modified document...")
-        processor.save_document(output_path)
+        if profile is not None:
+            profile.stages.update(stage_seconds)
+        if timings is not None:
+            timings.update(stage_seconds)
+            timings['image_ms'] = ocr_stats.pop('image_ms')
+            timings['ocr_stats'] = ocr_stats
         
         logger.info("=" * 60)
         logger.info("Processing completed successfully!")
         logger.info(f"Output saved to: {output_path}")
         logger.info(f"Total images processed: {len(image_texts)}")
+        logger.info(f"OCR calls saved by near-duplicate detection: {ocr_stats['duplicates_reused']}")
+        logger.info(f"Non-text images skipped by the text classifier: {ocr_stats['skipped_non_text']} "
+                    f"(~{ocr_stats['ocr_seconds_saved']:.1f}s of OCR saved)")
+        if enhanced:
+            logger.info(f"Preprocessing time: {ocr.preprocessor.summary()}")
         logger.info("=" * 60)
         
         return True
@@ -134,6 +199,10 @@ Examples:
   python main.py input.docx -o output.docx
   python main.py input.docx --placement replace
   python main.py input.docx --lang fra --enhanced
+  python main.py input.docx --lang auto
+  python main.py input.docx --workers 4
+  python main.py input.docx --profile --cprofile
+  python main.py input.docx --format jsonl
         """
     )
     
@@ -144,10 +213,18 @@ Examples:
     
     parser.add_argument(
         '-o', '--output',
-        help='Path to output Word document (default: input_processed.docx)',
+        help='Path to output file (default: input_processed.docx, or .json/.jsonl/.txt with --format)',
         default=None
     )
     
+    parser.add_argument(
+        '-f', '--format',
+        choices=text_export.FORMATS,
+        default=text_export.DOCX,
+        help='docx: write the document with the text inserted (default); json, jsonl, txt: '
+             'write only the text of each image with its position, without rebuilding the document'
+    )
+    
     parser.add_argument(
         '-p', '--placement',
         choices=['below', 'replace'],
@@ -158,7 +235,7 @@ Examples:
     parser.add_argument(
         '-l', '--lang',
         default=config.OCR_LANG,
-        help=f'OCR language code (default: {config.OCR_LANG})'
+        help=f'OCR language code, or auto to detect orientation and script per image (default: {config.OCR_LANG})'
     )
     
     parser.add_argument(
@@ -167,6 +244,25 @@ Examples:
         help='Use enhanced OCR with image preprocessing'
     )
     
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=config.OCR_WORKERS,
+        help=f'Number of images to OCR in parallel (default: {config.OCR_WORKERS})'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Write a JSON and HTML performance report next to the output document'
+    )
+    
+    parser.add_argument(
+        '--cprofile',
+        action='store_true',
+        help='With --profile, also record a cProfile of the run (main thread only)'
+    )
+    
     parser.add_argument(
         '--log-level',
         choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
@@ -179,13 +275,21 @@ Examples:
     # Setup logging
     setup_logging(args.log_level)
     
+    profile = None
+    if args.profile:
+        from profiler import DocumentProfile
+        profile = DocumentProfile(args.input, cprofile=args.cprofile)
+    
     # Process document
     success = process_document(
         input_path=args.input,
         output_path=args.output,
         text_placement=args.placement,
         lang=args.lang,
-        enhanced=args.enhanced
+        enhanced=args.enhanced,
+        workers=args.workers,
+        profile=profile,
+        output_format=args.format
     )
     
     sys.exit(0 if success else 1)
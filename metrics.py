@@ -0,0 +1,275 @@
+"""
+Service metrics in the Prometheus text exposition format
+
+Counters, histograms and gauges are stored in a SQLite database (WAL mode)
+shared by all gunicorn workers, like the OCR cache and the job queue, so
+that /metrics reports totals for the whole service whichever worker answers
+the scrape. No metrics server or client library is needed.
+
+Gauges such as in-flight requests are kept per process and summed over the
+processes that are still alive, so a worker killed mid-request does not
+leave the gauge stuck.
+
+Updates are added up in memory and each process writes them in one
+transaction every config.METRICS_FLUSH_INTERVAL seconds, so recording a
+metric never waits on SQLite's writer lock.
+"""
+import atexit
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import config
+from process_utils import pid_alive
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    series TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT NOT NULL,
+    le REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (name, le)
+);
+CREATE TABLE IF NOT EXISTS gauges (
+    name TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, pid)
+);
+"""
+
+PREFIX = 'image2text_'
+
+# Metric name -> (type, help text)
+METRICS = {
+    'extract_seconds': ('histogram', 'Time to list the images of an uploaded document'),
+    'ocr_image_seconds': ('histogram', 'Preprocessing and OCR time per image actually OCR\'d (not cached or reused)'),
+    'reconstruct_seconds': ('histogram', 'Time to insert the extracted text into the document'),
+    'save_seconds': ('histogram', 'Time to write the output document'),
+    'ocr_slot_wait_seconds': ('histogram', 'Time OCR calls waited for a free host-wide OCR slot (waits over 10ms)'),
+    'documents_total': ('counter', 'Documents processed, by result'),
+    'images_processed_total': ('counter', 'Images whose text was extracted, reused or read from the cache'),
+    'images_skipped_total': ('counter', 'Images skipped before OCR, by reason'),
+    'images_failed_total': ('counter', 'Images whose OCR failed'),
+    'ocr_busy_rejections_total': ('counter', 'OCR calls abandoned because no OCR slot freed up within the wait budget'),
+    'uploaded_bytes_total': ('counter', 'Bytes of uploaded documents'),
+    'janitor_files_removed_total': ('counter', 'Uploads and outputs removed by the janitor, by reason (age or quota)'),
+    'janitor_bytes_reclaimed_total': ('counter', 'Bytes freed by the janitor, by reason (age or quota)'),
+    'requests_in_flight': ('gauge', 'Requests being handled right now'),
+    'job_queue_depth': ('gauge', 'Background jobs waiting to run'),
+}
+
+
+def _series(name: str, labels: Dict[str, str]) -> str:
+    """Series name with labels in exposition syntax, e.g. name{reason="small"}"""
+    if not labels:
+        return name
+    pairs = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{pairs}}}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metrics:
+    """Metrics store shared between processes"""
+
+    def __init__(self, path: str = None, buckets: List[float] = None):
+        """
+        Initialize the store
+
+        Args:
+            path: Path to the SQLite database file
+            buckets: Histogram bucket upper bounds in seconds (default: config.METRICS_BUCKETS)
+        """
+        self.path = Path(path or config.METRICS_PATH)
+        self.buckets = sorted(buckets or config.METRICS_BUCKETS) + [math.inf]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Updates not yet written, and the process they were recorded in
+        self._pending_pid = None
+        self._reset_pending()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connect().executescript(SCHEMA)
+        atexit.register(self.flush)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get a connection for the current thread and process"""
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _reset_pending(self):
+        self._counters: Dict[str, float] = {}
+        self._bucket_counts: Dict[Tuple[str, float], int] = {}
+        self._gauges: Dict[str, float] = {}
+
+    @contextmanager
+    def _pending(self):
+        """Hold the lock over this process's unwritten updates, starting the flush thread"""
+        with self._lock:
+            if self._pending_pid != os.getpid():
+                # Updates inherited through fork belong to the parent, and its flush thread did not survive
+                self._reset_pending()
+                self._pending_pid = os.getpid()
+                threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+            yield
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pending_pid == pid:
+            time.sleep(config.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """Write the updates kept in memory by this process to the database"""
+        with self._lock:
+            if self._pending_pid != os.getpid():
+                return
+            counters, bucket_counts, gauges = self._counters, self._bucket_counts, self._gauges
+            self._reset_pending()
+        if not (counters or bucket_counts or gauges):
+            return
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN')
+            conn.executemany(
+                "INSERT INTO counters (series, value) VALUES (?, ?) "
+                "ON CONFLICT(series) DO UPDATE SET value = value + excluded.value",
+                counters.items()
+            )
+            conn.executemany(
+                "INSERT INTO buckets (name, le, count) VALUES (?, ?, ?) "
+                "ON CONFLICT(name, le) DO UPDATE SET count = count + excluded.count",
+                [(name, le, count) for (name, le), count in bucket_counts.items()]
+            )
+            conn.executemany(
+                "INSERT INTO gauges (name, pid, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(name, pid) DO UPDATE SET value = value + excluded.value",
+                [(name, os.getpid(), value) for name, value in gauges.items()]
+            )
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            logger.warning(f"Failed to write metrics: {e}")
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Add to a counter"""
+        if not amount:
+            return
+        series = _series(name, labels)
+        with self._pending():
+            self._counters[series] = self._counters.get(series, 0) + amount
+
+    def observe(self, name: str, seconds: float):
+        """Record one observation in a histogram"""
+        le = next(bound for bound in self.buckets if seconds <= bound)
+        with self._pending():
+            self._bucket_counts[name, le] = self._bucket_counts.get((name, le), 0) + 1
+            self._counters[f"{name}_sum"] = self._counters.get(f"{name}_sum", 0) + seconds
+
+    @contextmanager
+    def timer(self, name: str):
+        """Time a block of code into a histogram; the dict yielded receives the 'seconds'"""
+        timing = {}
+        start = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            timing['seconds'] = time.perf_counter() - start
+            self.observe(name, timing['seconds'])
+
+    def add_to_gauge(self, name: str, amount: float):
+        """Change this process's share of a gauge"""
+        with self._pending():
+            self._gauges[name] = self._gauges.get(name, 0) + amount
+
+    def _live_gauges(self, conn: sqlite3.Connection) -> Dict[str, float]:
+        """Sum gauges over live processes, dropping the rows of dead ones"""
+        totals = {}
+        dead = set()
+        for name, pid, value in conn.execute("SELECT name, pid, value FROM gauges"):
+            if pid != os.getpid() and not pid_alive(pid):
+                dead.add(pid)
+                continue
+            totals[name] = totals.get(name, 0) + value
+        for pid in dead:
+            conn.execute("DELETE FROM gauges WHERE pid = ?", (pid,))
+        return totals
+
+    def render(self, extra_gauges: Dict[str, float] = None) -> str:
+        """
+        Format all metrics in the Prometheus text exposition format
+
+        Args:
+            extra_gauges: Gauge values computed at scrape time, by metric name
+
+        Other processes' updates from the last config.METRICS_FLUSH_INTERVAL
+        seconds may not be included yet.
+        """
+        self.flush()
+        conn = self._connect()
+        counters = dict(conn.execute("SELECT series, value FROM counters"))
+        histograms: Dict[str, List[Tuple[float, int]]] = {}
+        for name, le, count in conn.execute("SELECT name, le, count FROM buckets ORDER BY le"):
+            histograms.setdefault(name, []).append((le, count))
+        gauges = self._live_gauges(conn)
+        gauges.update(extra_gauges or {})
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            full_name = PREFIX + name
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+
+            if kind == 'counter':
+                series = sorted(key for key in counters if key == name or key.startswith(name + '{'))
+                for key in series:
+                    lines.append(f"{PREFIX}{key} {_format_value(counters[key])}")
+                if not series:
+                    lines.append(f"{full_name} 0")
+            elif kind == 'gauge':
+                lines.append(f"{full_name} {_format_value(gauges.get(name, 0))}")
+            else:
+                # Buckets are stored individually; the exposition format wants them cumulative
+                observed = dict(histograms.get(name, []))
+                cumulative = 0
+                for le in self.buckets:
+                    cumulative += observed.get(le, 0)
+                    lines.append(f'{full_name}_bucket{{le="{_format_value(le)}"}} {cumulative}')
+                lines.append(f"{full_name}_sum {_format_value(counters.get(name + '_sum', 0))}")
+                lines.append(f"{full_name}_count {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide metrics store"""
+    global _default_metrics
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics()
+        return _default_metrics
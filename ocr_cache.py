@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Persistent, content-addressed cache of OCR results
+
+Results are stored in a SQLite database in WAL mode so that every gunicorn
+worker and every batch_process.py run on the host can share one cache.
+Entries are keyed by a hash of the image bytes together with the OCR
+settings that affect the output (language, Tesseract config, enhanced mode).
+
+Lookups stay off SQLite's single writer lock as far as possible: a hit only
+refreshes the entry's last-used time when it is more than
+config.OCR_CACHE_TOUCH_INTERVAL old, and hit/miss counts are added up in
+memory and written every config.OCR_CACHE_COUNTER_FLUSH_INTERVAL seconds.
+"""
+import argparse
+import atexit
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class OCRCache:
+    """On-disk OCR result cache shared between processes"""
+
+    def __init__(self, path: str = None, max_bytes: int = None, max_age_days: float = None):
+        """
+        Initialize the cache
+
+        Args:
+            path: Path to the SQLite database file
+            max_bytes: Total size of cached text before oldest entries are evicted
+            max_age_days: Entries not used for this many days are evicted
+        """
+        self.path = Path(path or config.OCR_CACHE_PATH)
+        self.max_bytes = max_bytes if max_bytes is not None else config.OCR_CACHE_MAX_BYTES
+        self.max_age_days = max_age_days if max_age_days is not None else config.OCR_CACHE_MAX_AGE_DAYS
+        self._local = threading.local()
+        self._puts = 0
+        self._lock = threading.Lock()
+        # Hit/miss counts not yet written, and the process they were counted in
+        self._counts = {}
+        self._counts_pid = os.getpid()
+        self._last_flush = time.monotonic()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        atexit.register(self.flush_counters)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get a connection for the current thread and process"""
+        # Connections must not cross a fork, so they are keyed by pid as well
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    @staticmethod
+    def make_key(image_data: bytes, lang: str, ocr_config: str, enhanced: bool,
+                 variant: str = '') -> str:
+        """
+        Build the cache key for an image and the OCR settings used on it
+
+        Args:
+            variant: Any other settings that change the OCR output, such as
+                     image normalization
+        """
+        digest = hashlib.sha256(image_data).hexdigest()
+        settings = f"{digest}|{lang}|{ocr_config}|{int(bool(enhanced))}"
+        if variant:
+            settings += f"|{variant}"
+        return hashlib.sha256(settings.encode('utf-8')).hexdigest()
+
+    def _bump(self, conn: sqlite3.Connection, name: str, amount: int = 1):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def _count(self, name: str):
+        """Count a hit or miss in memory, writing the counts out if they are due"""
+        with self._lock:
+            if self._counts_pid != os.getpid():
+                # Counts inherited through fork belong to the parent
+                self._counts = {}
+                self._counts_pid = os.getpid()
+            self._counts[name] = self._counts.get(name, 0) + 1
+            due = time.monotonic() - self._last_flush >= config.OCR_CACHE_COUNTER_FLUSH_INTERVAL
+        if due:
+            self.flush_counters()
+
+    def flush_counters(self):
+        """Write the hit/miss counts kept in memory to the database"""
+        with self._lock:
+            if self._counts_pid != os.getpid():
+                self._counts = {}
+                self._counts_pid = os.getpid()
+            counts, self._counts = self._counts, {}
+            self._last_flush = time.monotonic()
+        if not counts:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute('BEGIN')
+                for name, amount in counts.items():
+                    self._bump(conn, name, amount)
+        except sqlite3.Error as e:
+            logger.warning(f"OCR cache counter update failed: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached OCR result
+
+        Returns:
+            Cached text, or None on a miss
+        """
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT text, accessed FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count('misses')
+                return None
+            now = time.time()
+            # Eviction only needs last-used times to the hour, not a write per hit
+            if now - row[1] > config.OCR_CACHE_TOUCH_INTERVAL:
+                conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._count('hits')
+            return row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"OCR cache lookup failed: {e}")
+            return None
+
+    def put(self, key: str, text: str):
+        """Store an OCR result"""
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, text, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, text, len(key) + len(text.encode('utf-8')), now, now)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"OCR cache store failed: {e}")
+            return
+
+        with self._lock:
+            self._puts += 1
+            evict_now = self._puts % config.OCR_CACHE_EVICT_EVERY == 0
+        if evict_now:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Enforce the age and size limits, oldest entries first
+
+        Returns:
+            Number of entries removed
+        """
+        conn = self._connect()
+        removed = 0
+        try:
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += conn.execute("DELETE FROM entries WHERE accessed < ?", (cutoff,)).rowcount
+
+            if self.max_bytes:
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > self.max_bytes:
+                    # Walk entries from least recently used until we are back under quota
+                    excess = total - self.max_bytes
+                    cutoff = None
+                    freed = 0
+                    for accessed, size in conn.execute(
+                            "SELECT accessed, size FROM entries ORDER BY accessed"):
+                        freed += size
+                        cutoff = accessed
+                        if freed >= excess:
+                            break
+                    if cutoff is not None:
+                        removed += conn.execute(
+                            "DELETE FROM entries WHERE accessed <= ?", (cutoff,)
+                        ).rowcount
+
+            if removed:
+                self._bump(conn, 'evictions', removed)
+                logger.info(f"Evicted {removed} OCR cache entries")
+        except sqlite3.Error as e:
+            logger.warning(f"OCR cache eviction failed: {e}")
+        return removed
+
+    def purge(self, older_than_days: float = None) -> int:
+        """
+        Remove entries unused for the given number of days, or all entries
+
+        Returns:
+            Number of entries removed
+        """
+        conn = self._connect()
+        if older_than_days is None:
+            removed = conn.execute("DELETE FROM entries").rowcount
+        else:
+            cutoff = time.time() - older_than_days * 86400
+            removed = conn.execute("DELETE FROM entries WHERE accessed < ?", (cutoff,)).rowcount
+        conn.execute("VACUUM")
+        return removed
+
+    def reset_counters(self):
+        """Reset the hit/miss/eviction counters"""
+        with self._lock:
+            self._counts = {}
+        self._connect().execute("DELETE FROM counters")
+
+    def stats(self) -> Dict:
+        """Return entry counts, size and hit/miss counters"""
+        self.flush_counters()
+        conn = self._connect()
+        entries, total, oldest, newest = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(accessed), MAX(accessed) FROM entries"
+        ).fetchone()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = hits + misses
+        return {
+            'path': str(self.path),
+            'entries': entries,
+            'total_bytes': total,
+            'max_bytes': self.max_bytes,
+            'max_age_days': self.max_age_days,
+            'oldest_access': oldest,
+            'newest_access': newest,
+            'hits': hits,
+            'misses': misses,
+            'evictions': counters.get('evictions', 0),
+            'hit_rate': hits / lookups if lookups else 0.0,
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[OCRCache]:
+    """Return the process-wide cache, or None if caching is disabled"""
+    global _default_cache
+    if not config.OCR_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = OCRCache()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"OCR cache unavailable, continuing without it: {e}")
+                return None
+        return _default_cache
+
+
+def _format_time(timestamp: Optional[float]) -> str:
+    if timestamp is None:
+        return '-'
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+
+def main():
+    """Command-line interface to inspect and purge the cache"""
+    parser = argparse.ArgumentParser(
+        description='Inspect and maintain the shared OCR result cache',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python ocr_cache.py stats
+  python ocr_cache.py evict
+  python ocr_cache.py purge --older-than-days 30
+  python ocr_cache.py purge --all
+        """
+    )
+
+    parser.add_argument(
+        '--path',
+        default=config.OCR_CACHE_PATH,
+        help=f'Cache database path (default: {config.OCR_CACHE_PATH})'
+    )
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='Show cache size and hit/miss counters')
+    subparsers.add_parser('evict', help='Apply the configured age and size limits now')
+
+    purge_parser = subparsers.add_parser('purge', help='Remove cache entries')
+    purge_group = purge_parser.add_mutually_exclusive_group(required=True)
+    purge_group.add_argument('--older-than-days', type=float, help='Remove entries unused for N days')
+    purge_group.add_argument('--all', action='store_true', help='Remove all entries')
+    purge_parser.add_argument('--reset-stats', action='store_true', help='Also reset hit/miss counters')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    cache = OCRCache(args.path)
+
+    if args.command == 'stats':
+        stats = cache.stats()
+        print(f"Cache:        {stats['path']}")
+        print(f"Entries:      {stats['entries']}")
+        print(f"Size:         {stats['total_bytes'] / 1024 / 1024:.2f} MB "
+              f"(limit {stats['max_bytes'] / 1024 / 1024:.0f} MB)")
+        print(f"Max age:      {stats['max_age_days']} days")
+        print(f"Oldest used:  {_format_time(stats['oldest_access'])}")
+        print(f"Newest used:  {_format_time(stats['newest_access'])}")
+        print(f"Hits:         {stats['hits']}")
+        print(f"Misses:       {stats['misses']}")
+        print(f"Hit rate:     {stats['hit_rate']:.1%}")
+        print(f"Evictions:    {stats['evictions']}")
+    elif args.command == 'evict':
+        print(f"Evicted {cache.evict()} entries")
+    elif args.command == 'purge':
+        removed = cache.purge(None if args.all else args.older_than_days)
+        if args.reset_stats:
+            cache.reset_counters()
+        print(f"Removed {removed} entries")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
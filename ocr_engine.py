@@ -0,0 +1,267 @@
+"""
+OCR engine backends
+
+An engine turns images into text. OCRProcessor handles caching, duplicate
+detection and parallelism on top of whichever engine is configured:
+
+- 'pytesseract' (default): runs the tesseract executable per call, or once
+  per batch of images
+- 'tesserocr': keeps the Tesseract API and language model loaded in-process
+  for the life of the worker (requires the optional tesserocr package)
+"""
+import logging
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+from typing import Dict, List
+
+import pytesseract
+from PIL import Image
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Tesseract's OpenMP threads would multiply the CPU use of every concurrent OCR call
+# (see ocr_governor); set before any engine starts so subprocesses and tesserocr see it
+os.environ.setdefault('OMP_THREAD_LIMIT', str(config.OCR_THREAD_LIMIT))
+
+
+class OCREngine:
+    """Interface implemented by OCR backends"""
+
+    name = None
+
+    # True if images_to_strings is cheaper than calling image_to_string per image
+    supports_batch = False
+
+    def version(self) -> str:
+        """Version of the underlying Tesseract library"""
+        raise NotImplementedError
+
+    def languages(self) -> List[str]:
+        """Language codes with installed traineddata (probed on first use, then cached)"""
+        raise NotImplementedError
+
+    def image_to_string(self, image: Image.Image, lang: str, ocr_config: str) -> str:
+        """Run OCR on one image (raises on failure)"""
+        raise NotImplementedError
+
+    def images_to_strings(self, images: List[Image.Image], lang: str, ocr_config: str) -> List[str]:
+        """Run OCR on several images, returning text in the same order (raises on failure)"""
+        return [self.image_to_string(image, lang, ocr_config) for image in images]
+
+    def detect_orientation(self, image: Image.Image) -> Dict:
+        """
+        Run orientation and script detection (needs the 'osd' traineddata; raises on failure)
+
+        Returns:
+            rotate (degrees clockwise that make the image upright: 0, 90, 180
+            or 270), orientation_conf, script (e.g. 'Latin', 'Cyrillic') and
+            script_conf
+        """
+        raise NotImplementedError
+
+
+class PytesseractEngine(OCREngine):
+    """Runs the tesseract executable through pytesseract"""
+
+    name = 'pytesseract'
+    supports_batch = True
+
+    def __init__(self):
+        # Probe once per engine instance rather than once per document
+        try:
+            self._version = str(pytesseract.get_tesseract_version())
+            logger.info("Tesseract OCR is available")
+        except Exception as e:
+            logger.error(f"Tesseract not found. Please install Tesseract OCR: {e}")
+            raise
+        self._languages = None
+
+    def version(self) -> str:
+        return self._version
+
+    def languages(self) -> List[str]:
+        if self._languages is None:
+            self._languages = sorted(pytesseract.get_languages(config=''))
+        return self._languages
+
+    def image_to_string(self, image: Image.Image, lang: str, ocr_config: str) -> str:
+        return pytesseract.image_to_string(image, lang=lang, config=ocr_config)
+
+    def detect_orientation(self, image: Image.Image) -> Dict:
+        osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+        return {
+            'rotate': int(osd['rotate']),
+            'orientation_conf': float(osd['orientation_conf']),
+            'script': osd['script'],
+            'script_conf': float(osd['script_conf']),
+        }
+
+    def images_to_strings(self, images: List[Image.Image], lang: str, ocr_config: str) -> List[str]:
+        """
+        Run a single Tesseract process over several images
+
+        Tesseract accepts a text file listing image paths and treats each image
+        as a page, so the process startup and traineddata load are paid once.
+        Pages are separated by a form feed in the output.
+        """
+        with tempfile.TemporaryDirectory(prefix='image2text_') as tmpdir:
+            paths = []
+            for idx, image in enumerate(images):
+                # Flatten transparency onto white the same way pytesseract does
+                if 'A' in image.getbands():
+                    background = Image.new('RGB', image.size, (255, 255, 255))
+                    background.paste(image, (0, 0), image.getchannel('A'))
+                    image = background
+                elif image.mode not in ('1', 'L', 'RGB'):
+                    image = image.convert('RGB')
+
+                path = os.path.join(tmpdir, f"image_{idx}.{config.IMAGE_FORMAT.lower()}")
+                image.save(path, format=config.IMAGE_FORMAT)
+                paths.append(path)
+
+            list_path = os.path.join(tmpdir, 'images.txt')
+            with open(list_path, 'w') as list_file:
+                list_file.write('\n'.join(paths) + '\n')
+
+            command = [pytesseract.pytesseract.tesseract_cmd, list_path, 'stdout', '-l', lang]
+            command += shlex.split(ocr_config, posix=os.name != 'nt')
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode('utf-8', errors='replace').strip())
+
+        pages = result.stdout.decode('utf-8', errors='replace').split('\f')
+        # Depending on the Tesseract version the separator may also follow the last page
+        if len(pages) == len(images) + 1 and not pages[-1].strip():
+            pages = pages[:-1]
+        if len(pages) != len(images):
+            raise RuntimeError(f"expected {len(images)} pages of output, got {len(pages)}")
+
+        return pages
+
+
+class TesserocrEngine(OCREngine):
+    """
+    Calls the Tesseract C++ API in-process through tesserocr
+
+    Each thread keeps its own loaded API per language and configuration,
+    because a TessBaseAPI instance must not be used from two threads at once.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self):
+        try:
+            import tesserocr
+        except ImportError as e:
+            raise ImportError(
+                "OCR_ENGINE 'tesserocr' requires the tesserocr package: pip install tesserocr"
+            ) from e
+
+        self._tesserocr = tesserocr
+        self._version = tesserocr.tesseract_version().split()[1]
+        self._languages = sorted(tesserocr.get_languages()[1])
+        self._local = threading.local()
+        logger.info(f"Tesseract API loaded in-process (version {self._version})")
+
+    def version(self) -> str:
+        return self._version
+
+    def languages(self) -> List[str]:
+        return self._languages
+
+    def _parse_config(self, ocr_config: str) -> Dict:
+        """Translate a tesseract command-line config string into API settings"""
+        settings = {'psm': None, 'oem': None, 'variables': {}}
+        tokens = shlex.split(ocr_config or '')
+        idx = 0
+        while idx < len(tokens):
+            token = tokens[idx]
+            if token in ('--psm', '--oem') and idx + 1 < len(tokens):
+                settings[token[2:]] = int(tokens[idx + 1])
+                idx += 2
+            elif token == '-c' and idx + 1 < len(tokens) and '=' in tokens[idx + 1]:
+                name, value = tokens[idx + 1].split('=', 1)
+                settings['variables'][name] = value
+                idx += 2
+            else:
+                logger.warning(f"Ignoring unsupported OCR config option for tesserocr: {token}")
+                idx += 1
+        return settings
+
+    def _get_api(self, lang: str, ocr_config: str):
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = {}
+
+        key = (lang, ocr_config)
+        api = apis.get(key)
+        if api is None:
+            settings = self._parse_config(ocr_config)
+            kwargs = {'lang': lang}
+            if settings['psm'] is not None:
+                kwargs['psm'] = settings['psm']
+            if settings['oem'] is not None:
+                kwargs['oem'] = settings['oem']
+            api = self._tesserocr.PyTessBaseAPI(**kwargs)
+            for name, value in settings['variables'].items():
+                api.SetVariable(name, value)
+            apis[key] = api
+        return api
+
+    def image_to_string(self, image: Image.Image, lang: str, ocr_config: str) -> str:
+        api = self._get_api(lang, ocr_config)
+        api.SetImage(image)
+        try:
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def detect_orientation(self, image: Image.Image) -> Dict:
+        api = self._get_api('osd', '--psm 0')
+        api.SetImage(image)
+        try:
+            osd = api.DetectOrientationScript()
+        finally:
+            api.Clear()
+        if not osd:
+            raise RuntimeError("orientation and script detection found too little text")
+        return {
+            # The API reports the page's orientation; the correction turns it back
+            'rotate': (360 - osd['orient_deg']) % 360,
+            'orientation_conf': osd['orient_conf'],
+            'script': osd['script_name'],
+            'script_conf': osd['script_conf'],
+        }
+
+
+ENGINES = {
+    PytesseractEngine.name: PytesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name: str = None) -> OCREngine:
+    """
+    Return the process-wide instance of an OCR engine
+
+    Args:
+        name: Engine name (default: config.OCR_ENGINE)
+    """
+    name = name or config.OCR_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine '{name}'. Choose from: {', '.join(ENGINES)}")
+
+    with _engines_lock:
+        engine = _engines.get(name)
+        if engine is None:
+            engine = _engines[name] = ENGINES[name]()
+        return engine
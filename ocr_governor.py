@@ -0,0 +1,168 @@
+"""
+Host-wide limit on concurrent OCR
+
+Every Tesseract call (a subprocess with the pytesseract engine, an API call
+with tesserocr) first takes one of config.OCR_MAX_CONCURRENT slots. Slots
+are lock files in config.OCR_SLOT_DIR held with flock, so the limit covers
+all gunicorn workers, job threads and CLI runs on the machine, and a slot is
+released by the kernel if its holder dies.
+
+How long a caller may wait for a slot is set per context with wait_budget().
+The budget only applies to the first slot: a web request either gets OCR
+capacity within config.OCR_SLOT_WAIT_BUDGET and is then admitted for its
+whole document, or is answered with 503 before any of its images are OCR'd.
+Background jobs and the command-line tools wait as long as it takes.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl  # Not available on Windows
+except ImportError:
+    fcntl = None
+
+import config
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _WaitBudget:
+    """Admission state of one request; shared by the threads OCR'ing on its behalf"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.admitted = False
+
+
+# Wait budget of the current context (None = no limit)
+_wait_budget: ContextVar[Optional[_WaitBudget]] = ContextVar('ocr_wait_budget', default=None)
+
+
+class OCRBusyError(Exception):
+    """Raised when no OCR slot became free within the wait budget"""
+
+    def __init__(self, waited: float):
+        super().__init__(f"OCR capacity exhausted: no slot free after {waited:.1f}s")
+        self.waited = waited
+
+
+@contextmanager
+def wait_budget(seconds: Optional[float]):
+    """
+    Limit how long OCR in the enclosed block waits for its first slot
+
+    Once a slot has been obtained the block is admitted, and later slots
+    are waited for without limit, so work is never rejected halfway.
+    Threads that OCR on the caller's behalf share the budget if they are
+    handed work through contextvars.copy_context().run, as OCRProcessor does.
+    """
+    token = _wait_budget.set(_WaitBudget(seconds) if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _wait_budget.reset(token)
+
+
+class OCRGovernor:
+    """Counting semaphore shared by all processes on the host"""
+
+    def __init__(self, slots: int = None, directory: str = None):
+        """
+        Initialize the governor
+
+        Args:
+            slots: Maximum concurrent OCR calls (default: config.OCR_MAX_CONCURRENT)
+            directory: Where the slot lock files live (default: config.OCR_SLOT_DIR)
+        """
+        self.slots = max(1, slots or config.OCR_MAX_CONCURRENT)
+        self.directory = Path(directory or config.OCR_SLOT_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Without flock the limit can only be enforced within this process
+        self._local_slots = threading.BoundedSemaphore(self.slots) if fcntl is None else None
+
+    def _try_acquire(self):
+        """Lock a free slot file without blocking; returns its open file or None"""
+        # Start at a different slot in each thread so they don't all contend for slot 0
+        offset = threading.get_ident() % self.slots
+        for idx in range(self.slots):
+            handle = open(self.directory / f"slot-{(offset + idx) % self.slots}.lock", 'a')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                continue
+            return handle
+        return None
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold one OCR slot for the enclosed block
+
+        Raises:
+            OCRBusyError: if the context's wait budget ran out before it was admitted
+        """
+        state = _wait_budget.get()
+        budget = state.seconds if state is not None and not state.admitted else None
+        start = time.monotonic()
+
+        if self._local_slots is not None:
+            if not self._local_slots.acquire(timeout=budget):
+                raise self._busy(start)
+            if state is not None:
+                state.admitted = True
+            try:
+                yield
+            finally:
+                self._local_slots.release()
+            return
+
+        delay = 0.005
+        handle = self._try_acquire()
+        while handle is None:
+            waited = time.monotonic() - start
+            if budget is not None and waited >= budget:
+                raise self._busy(start)
+            time.sleep(delay if budget is None else min(delay, budget - waited))
+            delay = min(delay * 2, 0.1)
+            handle = self._try_acquire()
+
+        waited = time.monotonic() - start
+        if waited > 0.01:
+            get_metrics().observe('ocr_slot_wait_seconds', waited)
+        if state is not None:
+            state.admitted = True
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    def _busy(self, start: float) -> OCRBusyError:
+        waited = time.monotonic() - start
+        logger.warning(f"All {self.slots} OCR slots stayed busy for {waited:.1f}s; rejecting work")
+        get_metrics().inc('ocr_busy_rejections_total')
+        return OCRBusyError(waited)
+
+
+_governor = None
+_governor_pid = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> OCRGovernor:
+    """Return the process-wide governor"""
+    global _governor, _governor_pid
+    with _governor_lock:
+        # A semaphore inherited through fork would count the parent's holders
+        if _governor is None or _governor_pid != os.getpid():
+            _governor = OCRGovernor()
+            _governor_pid = os.getpid()
+        return _governor
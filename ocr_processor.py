@@ -1,36 +1,83 @@
 """
 OCR processor using Tesseract
 """
-import pytesseract
 from PIL import Image
 import logging
-from typing import Optional
+import contextvars
+import os
+import threading
+import time
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 import config
+from ocr_cache import OCRCache, get_default_cache
+from ocr_engine import OCREngine, get_engine
+from ocr_governor import OCRBusyError, get_governor
+from image_dedup import DuplicateIndex
+from image_normalize import (draft_decode, normalize_for_ocr, split_into_bands,
+                             signature as normalization_signature)
+from text_classifier import text_likelihood
+from preprocessing import PreprocessingPipeline
+from checkpoint import Checkpoint, open_checkpoint
+import auto_lang
 
 logger = logging.getLogger(__name__)
 
+# Key in a prepared image's info dict holding the language chosen for it in auto mode
+LANG_INFO_KEY = 'image2text_lang'
+# Key in a document image's info dict holding the cache key of its OSD result in auto mode
+OSD_KEY_INFO_KEY = 'image2text_osd_key'
+
 
 class OCRProcessor:
     """Process images using OCR to extract text"""
     
-    def __init__(self, lang: str = None, ocr_config: str = None):
+    def __init__(self, lang: str = None, ocr_config: str = None, cache: OCRCache = None,
+                 engine: OCREngine = None):
         """
         Initialize OCR processor
         
         Args:
             lang: Language code for OCR (e.g., 'eng', 'fra', 'deu')
             ocr_config: Tesseract configuration string
+            cache: OCR result cache (default: the shared cache if enabled in config)
+            engine: OCR backend (default: the process-wide engine named by config.OCR_ENGINE)
         """
         self.lang = lang or config.OCR_LANG
         self.ocr_config = ocr_config or config.OCR_CONFIG
+        self.cache = cache if cache is not None else get_default_cache()
         
-        # Test if Tesseract is available
-        try:
-            pytesseract.get_tesseract_version()
-            logger.info("Tesseract OCR is available")
-        except Exception as e:
-            logger.error(f"Tesseract not found. Please install Tesseract OCR: {e}")
-            raise
+        # Raises if Tesseract is not available; the engine probes it only once per process
+        self.engine = engine or get_engine()
+        
+        # Steps run on each image in enhanced mode (config.PREPROCESS_STEPS)
+        self.preprocessor = PreprocessingPipeline()
+        
+        # Running totals across all documents handled by this processor
+        self.stats = {
+            'ocr_calls': 0,
+            'cache_hits': 0,
+            'duplicates_reused': 0,
+            'skipped_small': 0,
+            'skipped_non_text': 0,
+            'ocr_seconds': 0.0,
+            'classifier_seconds': 0.0,
+        }
+        self._stats_lock = threading.Lock()
+        
+        # Thread pools for OCR'ing images in parallel and for the bands of large
+        # images, created on first use in each process and kept for its lifetime
+        # (the tesserocr engine keeps a loaded API per thread)
+        self._ocr_pool = None
+        self._ocr_pool_pid = None
+        self._ocr_pool_size = 0
+        self._tile_pool = None
+        self._tile_pool_pid = None
+        self._pool_lock = threading.Lock()
+        
+        # Seconds spent in _prepare by the current thread, read by _iter_ocr
+        self._prepare_time = threading.local()
     
     def extract_text(self, image: Image.Image) -> str:
         """
@@ -43,15 +90,10 @@ class OCRProcessor:
             Extracted text as string
         """
         try:
-            # Perform OCR
-            text = pytesseract.image_to_string(
-                image,
-                lang=self.lang,
-                config=self.ocr_config
-            )
-            
-            # Clean up the text
-            text = text.strip()
+            lang = None
+            if self.lang == auto_lang.AUTO:
+                image, lang = auto_lang.orient_and_choose_language(image, self.engine, self.cache)
+            text = self._run_ocr(image, lang)
             
             if text:
                 logger.info(f"Successfully extracted {len(text)} characters")
@@ -64,46 +106,306 @@ class OCRProcessor:
             logger.error(f"OCR failed: {e}")
             return ""
     
-    def extract_text_from_bytes(self, image_data: bytes) -> str:
+    def _image_lang(self, image: Image.Image) -> str:
+        """Language to OCR a prepared image with: chosen per image by _prepare in auto mode"""
+        if self.lang != auto_lang.AUTO:
+            return self.lang
+        return image.info.get(LANG_INFO_KEY, config.OCR_AUTO_FALLBACK_LANG)
+    
+    def _run_ocr(self, image: Image.Image, lang: str = None) -> str:
+        """Run Tesseract on an image and return the stripped text (raises on failure)"""
+        with get_governor().slot():
+            text = self.engine.image_to_string(image, lang or self._image_lang(image), self.ocr_config)
+        
+        # Clean up the text
+        return text.strip()
+    
+    def _extract_uncached(self, image: Image.Image, enhanced: bool = False) -> Optional[str]:
+        """
+        Run OCR on an image, returning None on failure so that errors
+        are never mistaken for empty results and written to the cache
+        """
+        try:
+            return self._run_prepared(self._prepare(image, enhanced))
+        except OCRBusyError:
+            raise
+        except Exception as e:
+            logger.error(f"OCR failed: {e}")
+            return None
+    
+    def _prepare(self, image: Image.Image, enhanced: bool = False) -> Image.Image:
+        """
+        Normalize an image's geometry and, in enhanced mode, preprocess it for OCR
+        
+        In auto mode the normalized image is turned upright and its language
+        chosen (see auto_lang); the language travels with the image in its
+        info dict.
+        """
+        start = time.perf_counter()
+        osd_key = image.info.get(OSD_KEY_INFO_KEY)
+        if config.NORMALIZE_ENABLED:
+            image = normalize_for_ocr(image)
+        lang = None
+        if self.lang == auto_lang.AUTO:
+            # After normalization, so OSD doesn't pay for margins and oversized pixels
+            oriented, lang = auto_lang.orient_and_choose_language(image, self.engine, self.cache, osd_key)
+            if oriented is not image and config.NORMALIZE_ENABLED:
+                # A sideways image's lines can only be measured once it is upright
+                oriented = normalize_for_ocr(oriented)
+            image = oriented
+        if enhanced:
+            image = self.preprocess_image(image)
+        if lang is not None:
+            image.info[LANG_INFO_KEY] = lang
+        self._prepare_time.seconds = getattr(self._prepare_time, 'seconds', 0.0) + time.perf_counter() - start
+        return image
+    
+    def _is_oversized(self, image: Image.Image) -> bool:
+        """Whether a prepared image is large enough to be split into bands (config.OCR_TILE_MIN_PIXELS)"""
+        return image.width * image.height >= config.OCR_TILE_MIN_PIXELS
+    
+    def _run_prepared(self, image: Image.Image) -> str:
+        """OCR a prepared image, splitting it into bands OCR'd in parallel if it is very large"""
+        if not self._is_oversized(image):
+            return self._run_ocr(image)
+        
+        bands = split_into_bands(image, config.OCR_TILE_BANDS)
+        if len(bands) < 2:
+            return self._run_ocr(image)
+        
+        logger.info(f"Splitting {image.width}x{image.height} image into {len(bands)} bands for parallel OCR")
+        # Each band runs in the caller's context, so it waits for an OCR slot within the caller's budget
+        lang = self._image_lang(image)
+        futures = [self._get_tile_pool().submit(contextvars.copy_context().run, self._run_ocr, band, lang)
+                   for band in bands]
+        # Bands are in reading order; join them like the lines of one page
+        texts = [future.result() for future in futures]
+        return "\n".join(text for text in texts if text)
+    
+    def _get_ocr_pool(self, workers: int) -> ThreadPoolExecutor:
+        """
+        Shared pool that parallel OCR runs on, sized for the largest allowed
+        worker count; only replaced by a larger one if a caller asks for more
+        """
+        with self._pool_lock:
+            if (self._ocr_pool is None or self._ocr_pool_pid != os.getpid()
+                    or workers > self._ocr_pool_size):
+                if self._ocr_pool is not None and self._ocr_pool_pid == os.getpid():
+                    self._ocr_pool.shutdown(wait=False)
+                self._ocr_pool_size = max(workers, config.OCR_MAX_WORKERS, config.OCR_WORKERS)
+                self._ocr_pool = ThreadPoolExecutor(max_workers=self._ocr_pool_size, thread_name_prefix='ocr')
+                self._ocr_pool_pid = os.getpid()
+            return self._ocr_pool
+    
+    def _get_tile_pool(self) -> ThreadPoolExecutor:
+        """Shared pool bounding how many bands are OCR'd at once (threads don't survive fork)"""
+        with self._pool_lock:
+            if self._tile_pool is None or self._tile_pool_pid != os.getpid():
+                self._tile_pool = ThreadPoolExecutor(max_workers=config.OCR_TILE_WORKERS,
+                                                     thread_name_prefix='ocr-tile')
+                self._tile_pool_pid = os.getpid()
+            return self._tile_pool
+    
+    def _run_ocr_batch(self, images: List[Image.Image]) -> List[str]:
+        """Run OCR on several images in one engine call per language (raises on failure)"""
+        by_lang = {}
+        for idx, image in enumerate(images):
+            by_lang.setdefault(self._image_lang(image), []).append(idx)
+        
+        texts = [None] * len(images)
+        for lang, indices in by_lang.items():
+            with get_governor().slot():
+                results = self.engine.images_to_strings([images[idx] for idx in indices], lang, self.ocr_config)
+            for idx, text in zip(indices, results):
+                texts[idx] = text.strip()
+        return texts
+    
+    def _extract_batch_uncached(self, images: List[Image.Image], enhanced: bool = False) -> List[Optional[str]]:
+        """
+        Batched counterpart of _extract_uncached; falls back to one Tesseract
+        call per image if the batched run fails
+        """
+        try:
+            prepared = [self._prepare(image, enhanced) for image in images]
+            # Very large images are split into bands instead of being OCR'd in one piece
+            batched = [idx for idx, image in enumerate(prepared) if not self._is_oversized(image)]
+            texts = [None] * len(prepared)
+            if batched:
+                for idx, text in zip(batched, self._run_ocr_batch([prepared[idx] for idx in batched])):
+                    texts[idx] = text
+            for idx, image in enumerate(prepared):
+                if texts[idx] is None:
+                    texts[idx] = self._run_prepared(image)
+            return texts
+        except OCRBusyError:
+            raise
+        except Exception as e:
+            logger.warning(f"Batched OCR of {len(images)} images failed, retrying one by one: {e}")
+            return [self._extract_uncached(image, enhanced) for image in images]
+    
+    def extract_text_batch(self, images: List[Image.Image], enhanced: bool = False) -> List[str]:
+        """
+        Extract text from several images with one Tesseract invocation
+        
+        Args:
+            images: List of PIL Image objects
+            enhanced: Use enhanced OCR with preprocessing
+            
+        Returns:
+            Extracted text for each image, in the same order
+        """
+        return [text or "" for text in self._extract_batch_uncached(images, enhanced)]
+    
+    def _iter_ocr(self, images: List[Image.Image], enhanced: bool, workers: int,
+                  batch_size: int = None) -> Iterator[Tuple[int, Optional[str], float, float]]:
+        """
+        OCR a list of images, choosing between per-image and batched
+        Tesseract invocations and spreading the work over `workers` threads
+        
+        Args:
+            batch_size: Images per Tesseract call; by default lists of at
+                        least config.OCR_BATCH_MIN_IMAGES are batched up to
+                        config.OCR_BATCH_SIZE and shorter ones are not
+        
+        Yields:
+            (index, text, seconds, prepare_seconds) for each image as soon as
+            its OCR call finishes, where seconds includes prepare_seconds
+            spent normalizing and preprocessing; a batched call's durations
+            are split over its images
+        """
+        if not images:
+            return
+        
+        if batch_size is None:
+            batched = len(images) >= config.OCR_BATCH_MIN_IMAGES
+            batch_size = config.OCR_BATCH_SIZE
+        else:
+            batched = batch_size > 1
+        
+        if self.engine.supports_batch and batched:
+            # Split into one batch per worker, capped so a failing batch stays cheap to retry
+            chunk_size = max(1, min(batch_size, -(-len(images) // workers)))
+            units = [list(range(i, min(i + chunk_size, len(images))))
+                     for i in range(0, len(images), chunk_size)]
+            logger.info(f"Running batched OCR on {len(images)} images in {len(units)} Tesseract calls")
+            
+            def run_unit(unit):
+                return self._extract_batch_uncached([images[i] for i in unit], enhanced)
+        else:
+            units = [[i] for i in range(len(images))]
+            
+            def run_unit(unit):
+                return [self._extract_uncached(images[unit[0]], enhanced)]
+        
+        def timed(unit):
+            self._prepare_time.seconds = 0.0
+            start = time.perf_counter()
+            texts = run_unit(unit)
+            seconds = time.perf_counter() - start
+            return unit, texts, seconds / len(unit), self._prepare_time.seconds / len(unit)
+        
+        if workers > 1 and len(units) > 1:
+            logger.info(f"Running OCR on {len(images)} images with {workers} workers")
+            pool = self._get_ocr_pool(workers)
+            remaining = iter(units)
+            in_flight = set()
+            try:
+                while True:
+                    # The pool is shared, so this call keeps at most `workers` units in it
+                    for unit in islice(remaining, workers - len(in_flight)):
+                        in_flight.add(pool.submit(contextvars.copy_context().run, timed, unit))
+                    if not in_flight:
+                        break
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        unit, texts, seconds, prepare_seconds = future.result()
+                        for i, text in zip(unit, texts):
+                            yield i, text, seconds, prepare_seconds
+            finally:
+                # Don't start remaining work if the consumer stopped early
+                for future in in_flight:
+                    future.cancel()
+        else:
+            for unit in units:
+                unit, texts, seconds, prepare_seconds = timed(unit)
+                for i, text in zip(unit, texts):
+                    yield i, text, seconds, prepare_seconds
+    
+    def cache_key(self, image_data: bytes, enhanced: bool = False) -> str:
+        """Cache key for image bytes under this processor's OCR settings"""
+        variant = normalization_signature()
+        if enhanced:
+            variant += '|' + self.preprocessor.signature()
+        if self.lang == auto_lang.AUTO:
+            variant += '|' + auto_lang.signature(self.engine.languages())
+        return OCRCache.make_key(image_data, self.lang, self.ocr_config, enhanced, variant=variant)
+    
+    def open_checkpoint(self, document_hash: bytes, enhanced: bool = False) -> Optional[Checkpoint]:
+        """
+        Checkpoint for OCR'ing a document under this processor's settings,
+        or None if config.CHECKPOINT_ENABLED is off
+        
+        Args:
+            document_hash: Digest of the document file (checkpoint.document_digest)
+            enhanced: Whether enhanced OCR will be used
+        """
+        if not config.CHECKPOINT_ENABLED:
+            return None
+        try:
+            return open_checkpoint(self.cache_key(document_hash, enhanced))
+        except OSError as e:
+            logger.warning(f"OCR checkpoint unavailable, continuing without it: {e}")
+            return None
+    
+    def extract_text_from_bytes(self, image_data: bytes, enhanced: bool = False) -> str:
         """
         Extract text from image bytes
         
         Args:
             image_data: Image data as bytes
+            enhanced: Use enhanced OCR with preprocessing
             
         Returns:
             Extracted text as string
         """
         import io
         
+        key = None
+        if self.cache is not None:
+            key = self.cache_key(image_data, enhanced)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
         try:
             image = Image.open(io.BytesIO(image_data))
-            return self.extract_text(image)
+            if config.NORMALIZE_ENABLED:
+                draft_decode(image, image_data)
         except Exception as e:
             logger.error(f"Failed to process image bytes: {e}")
             return ""
+        
+        text = self._extract_uncached(image, enhanced)
+        if text is None:
+            return ""
+        if key is not None:
+            self.cache.put(key, text)
+        return text
     
     def preprocess_image(self, image: Image.Image) -> Image.Image:
         """
         Preprocess image to improve OCR accuracy
         
+        Converts to grayscale and runs the configured preprocessing steps
+        (deskew, denoise, binarize; see preprocessing.py).
+        
         Args:
             image: PIL Image object
             
         Returns:
             Preprocessed PIL Image
         """
-        # Convert to grayscale
-        if image.mode != 'L':
-            image = image.convert('L')
-        
-        # You can add more preprocessing steps here:
-        # - Increase contrast
-        # - Remove noise
-        # - Binarization
-        # - Deskewing
-        
-        return image
+        return self.preprocessor.process(image)
     
     def extract_text_enhanced(self, image: Image.Image) -> str:
         """
@@ -120,3 +422,372 @@ class OCRProcessor:
         
         # Extract text
         return self.extract_text(preprocessed_image)
+
+    def extract_text_from_images(self, images: List, enhanced: bool = False,
+                                 workers: int = None,
+                                 dedup_index: DuplicateIndex = None,
+                                 stats: Dict = None,
+                                 max_in_flight: int = None,
+                                 on_record: Callable[[Dict], None] = None,
+                                 checkpoint: Checkpoint = None) -> Dict[str, str]:
+        """
+        Extract text from a list of document images, optionally in parallel
+        
+        Each Tesseract call runs in its own subprocess, so a thread pool is
+        enough to keep several cores busy. Results are collected in document
+        order and are identical to the sequential path. Documents with at
+        least config.OCR_BATCH_MIN_IMAGES images to OCR are processed with
+        batched Tesseract invocations (see extract_text_batch).
+        
+        Near-identical images (see image_dedup) are OCR'd once per group and
+        the text is reused for the rest of the group.
+        
+        Args:
+            images: ImageInfo objects (a list or an iterator such as
+                    ImageExtractor.iter_images())
+            enhanced: Use enhanced OCR with preprocessing
+            workers: Number of images to OCR concurrently (default: config.OCR_WORKERS)
+            dedup_index: Near-duplicate index to share across documents
+                         (default: a new index per call if config.DEDUP_ENABLED)
+            stats: Optional dictionary that receives this call's counters
+                   (ocr_calls, cache_hits, duplicates_reused, skipped_small,
+                   skipped_non_text, ocr_seconds, classifier_seconds), the
+                   estimated ocr_seconds_saved by the text classifier and
+                   the OCR milliseconds of each image actually OCR'd as
+                   image_ms
+            max_in_flight: Maximum images held decoded at once
+                           (default: config.OCR_MAX_IN_FLIGHT); images are
+                           released once OCR'd, bounding peak memory
+            on_record: Optional callable that receives every record of
+                       iter_text_from_images (e.g. DocumentProfile.add_image)
+            checkpoint: Optional Checkpoint (see open_checkpoint); images it
+                        already holds are not OCR'd again and every new
+                        result is added to it
+            
+        Returns:
+            Dictionary mapping image_id to extracted text
+        """
+        images = list(images)
+        image_texts = {}
+        image_ms = []
+        for record in self.iter_text_from_images(images, enhanced=enhanced, workers=workers,
+                                                 dedup_index=dedup_index, stats=stats,
+                                                 max_in_flight=max_in_flight, checkpoint=checkpoint):
+            if on_record is not None:
+                on_record(record)
+            if not record['skipped']:
+                image_texts[record['image_id']] = record['text']
+            if not (record['skipped'] or record['cached'] or record['duplicate'] or record['resumed']):
+                image_ms.append(record['prepare_ms'] + record['ocr_ms'])
+        if stats is not None:
+            stats['image_ms'] = image_ms
+        
+        # Report in document order regardless of when each result arrived
+        ordered_texts = {}
+        for img_info in images:
+            if img_info.image_id not in image_texts:
+                continue
+            text = image_texts[img_info.image_id]
+            ordered_texts[img_info.image_id] = text
+            
+            if text:
+                logger.info(f"Extracted {len(text)} characters from {img_info.image_id}")
+            else:
+                logger.warning(f"No text extracted from {img_info.image_id}")
+        
+        return ordered_texts
+    
+    def iter_text_from_images(self, images: List, enhanced: bool = False,
+                              workers: int = None,
+                              dedup_index: DuplicateIndex = None,
+                              stats: Dict = None,
+                              max_in_flight: int = None,
+                              checkpoint: Checkpoint = None,
+                              stream: bool = False) -> Iterator[Dict]:
+        """
+        Extract text from document images, yielding each result as soon as it is known
+        
+        Takes the same arguments as extract_text_from_images. Skipped images
+        and cache hits are yielded as they are reached, OCR results in
+        completion order (document order when workers is 1) each time
+        max_in_flight images are waiting and at the end. Near-duplicates are
+        yielded right after the image whose text they reuse.
+        
+        With stream=True, time to the first result matters more than
+        throughput: pending images are OCR'd as soon as every worker has
+        config.OCR_STREAM_CHUNK of them, in calls of that many images,
+        instead of in large batches once max_in_flight are waiting.
+        
+        Yields:
+            Dictionaries with image_id, paragraph_index, run_index, text,
+            width and height (as decoded), decode_ms, prepare_ms
+            (normalization and preprocessing), ocr_ms, the flags cached,
+            duplicate, resumed (text taken from the checkpoint), skipped
+            and failed (OCR raised an error; text is empty), and skip_reason
+            ('small' or 'non_text') for skipped images
+        """
+        workers = max(1, workers or config.OCR_WORKERS)
+        if dedup_index is None and config.DEDUP_ENABLED:
+            dedup_index = DuplicateIndex()
+        namespace = (self.lang, self.ocr_config, enhanced)
+        
+        def make_record(img_info, text, ocr_ms=0.0, prepare_ms=0.0, cached=False, duplicate=False,
+                        resumed=False, skip_reason=None, failed=False):
+            # Every final text passes through here, so this is where it is checkpointed
+            if checkpoint is not None and not (resumed or failed or skip_reason):
+                checkpoint.add(img_info.image_id, text)
+            width, height, decode_ms = decoded.pop(img_info.image_id, (0, 0, 0.0))
+            return {
+                'image_id': img_info.image_id,
+                'paragraph_index': img_info.paragraph_index,
+                'run_index': img_info.run_index,
+                'text': text,
+                'width': width,
+                'height': height,
+                'decode_ms': round(decode_ms, 1),
+                'prepare_ms': round(prepare_ms, 1),
+                'ocr_ms': round(ocr_ms, 1),
+                'cached': cached,
+                'duplicate': duplicate,
+                'resumed': resumed,
+                'skipped': skip_reason is not None,
+                'skip_reason': skip_reason,
+                'failed': failed,
+            }
+        
+        # Decode, filter and consult the cache in the calling thread; only OCR is fanned out.
+        # At most max_in_flight images are held decoded: pending work is OCR'd
+        # whenever the limit is reached, and every image is released as soon
+        # as its text is known.
+        max_in_flight = max(1, max_in_flight or config.OCR_MAX_IN_FLIGHT)
+        batch_size = None
+        if stream:
+            batch_size = max(1, config.OCR_STREAM_CHUNK)
+            max_in_flight = min(max_in_flight, workers * batch_size)
+        total = len(images) if hasattr(images, '__len__') else '?'
+        pending = []
+        duplicates = {}
+        decoded = {}  # image_id -> (width, height, decode ms) until the image's record is made
+        counts = {'ocr_calls': 0, 'ocr_seconds': 0.0, 'duplicates': 0}
+        resumed_count = 0
+        cache_hits = 0
+        skipped_small = 0
+        skipped_non_text = 0
+        classifier_seconds = 0.0
+        
+        def promote(img_info):
+            # Decode a waiting duplicate again so it can be OCR'd as its group's representative
+            pil_image = img_info.to_pil_image()
+            if config.NORMALIZE_ENABLED:
+                draft_decode(pil_image, img_info.image_data)
+            pil_image.load()
+            key = self.cache_key(img_info.image_data, enhanced) if self.cache is not None else None
+            group = dedup_index.add(pil_image, dedup_index.hash_image(pil_image), namespace,
+                                    source=img_info.reloader())
+            if self.cache is not None and self.lang == auto_lang.AUTO:
+                pil_image.info[OSD_KEY_INFO_KEY] = auto_lang.cache_key(img_info.image_data)
+            return img_info, pil_image, key, group
+        
+        def run_pending():
+            while pending:
+                batch = pending[:]
+                del pending[:]
+                for idx, text, seconds, prepare_seconds in self._iter_ocr([item[1] for item in batch],
+                                                                          enhanced, workers, batch_size):
+                    img_info, _, key, group = batch[idx]
+                    img_info.release()
+                    counts['ocr_seconds'] += seconds
+                    if text is not None and key is not None:
+                        self.cache.put(key, text)
+                    yield make_record(img_info, text or "", ocr_ms=(seconds - prepare_seconds) * 1000,
+                                      prepare_ms=prepare_seconds * 1000, failed=text is None)
+                    
+                    if group is None:
+                        continue
+                    waiting = duplicates.pop(group, [])
+                    if text is None:
+                        # A failure must not be reused as a result: the first waiting
+                        # duplicate is OCR'd instead and the others wait for it
+                        dedup_index.discard(group, namespace)
+                        if waiting:
+                            item = promote(waiting[0])
+                            duplicates[item[3]] = waiting[1:]
+                            pending.append(item)
+                        continue
+                    dedup_index.set_text(group, text, namespace)
+                    counts['duplicates'] += len(waiting)
+                    for duplicate in waiting:
+                        yield make_record(duplicate, text, duplicate=True)
+                counts['ocr_calls'] += len(batch)
+        
+        for idx, img_info in enumerate(images, 1):
+            logger.info(f"Processing image {idx}/{total} - {img_info.image_id}")
+            
+            if checkpoint is not None and img_info.image_id in checkpoint.texts:
+                resumed_count += 1
+                img_info.release()
+                yield make_record(img_info, checkpoint.texts[img_info.image_id], resumed=True)
+                continue
+            
+            start = time.perf_counter()
+            pil_image = img_info.to_pil_image()
+            decoded[img_info.image_id] = (pil_image.width, pil_image.height, 0.0)
+            
+            # Check minimum image size
+            if (pil_image.width < config.MIN_IMAGE_SIZE[0] or 
+                pil_image.height < config.MIN_IMAGE_SIZE[1]):
+                logger.warning(f"Image {img_info.image_id} is too small, skipping")
+                skipped_small += 1
+                img_info.release()
+                yield make_record(img_info, "", skip_reason='small')
+                continue
+            
+            if config.NORMALIZE_ENABLED:
+                # Must happen before anything loads the pixels
+                draft_decode(pil_image, img_info.image_data)
+            # Decode now rather than inside whichever step first needs the
+            # pixels (the dedup hash, the classifier or OCR), so it is timed
+            pil_image.load()
+            decoded[img_info.image_id] = (pil_image.width, pil_image.height, (time.perf_counter() - start) * 1000)
+            
+            image_hash = None
+            if dedup_index is not None:
+                image_hash = dedup_index.hash_image(pil_image)
+                group = dedup_index.find(pil_image, image_hash, namespace)
+                if group is not None:
+                    logger.info(f"Image {img_info.image_id} is a near-duplicate, reusing OCR result")
+                    img_info.release()
+                    text = dedup_index.get_text(group, namespace)
+                    if text is not None:
+                        counts['duplicates'] += 1
+                        yield make_record(img_info, text, duplicate=True)
+                    else:
+                        # The group's representative is still waiting for OCR
+                        duplicates.setdefault(group, []).append(img_info)
+                    continue
+            
+            key = None
+            if self.cache is not None:
+                key = self.cache_key(img_info.image_data, enhanced)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    cache_hits += 1
+                    if dedup_index is not None:
+                        dedup_index.add(pil_image, image_hash, namespace, text=cached,
+                                        source=img_info.reloader())
+                    img_info.release()
+                    yield make_record(img_info, cached, cached=True)
+                    continue
+            
+            # Skip photos and graphics that would only cost a fruitless OCR pass
+            if config.TEXT_CLASSIFIER_ENABLED:
+                start = time.perf_counter()
+                score = text_likelihood(pil_image)
+                classifier_seconds += time.perf_counter() - start
+                if score < config.TEXT_CLASSIFIER_THRESHOLD:
+                    logger.info(f"Image {img_info.image_id} does not look like text "
+                                f"(score {score:.2f}), skipping")
+                    skipped_non_text += 1
+                    img_info.release()
+                    yield make_record(img_info, "", skip_reason='non_text')
+                    continue
+            
+            group = None
+            if dedup_index is not None:
+                group = dedup_index.add(pil_image, image_hash, namespace,
+                                        source=img_info.reloader())
+            if self.cache is not None and self.lang == auto_lang.AUTO:
+                pil_image.info[OSD_KEY_INFO_KEY] = auto_lang.cache_key(img_info.image_data)
+            pending.append((img_info, pil_image, key, group))
+            del pil_image
+            
+            if len(pending) >= max_in_flight:
+                yield from run_pending()
+        
+        if cache_hits:
+            logger.info(f"Reused cached OCR results for {cache_hits} images")
+        if resumed_count:
+            logger.info(f"Resumed {resumed_count} images from the checkpoint")
+        
+        yield from run_pending()
+        
+        duplicate_count = counts['duplicates']
+        if duplicate_count:
+            dedup_index.ocr_calls_saved += duplicate_count
+            logger.info(f"Near-duplicate detection saved {duplicate_count} OCR calls")
+        
+        run_stats = {
+            'ocr_calls': counts['ocr_calls'],
+            'cache_hits': cache_hits,
+            'duplicates_reused': duplicate_count,
+            'skipped_small': skipped_small,
+            'skipped_non_text': skipped_non_text,
+            'ocr_seconds': counts['ocr_seconds'],
+            'classifier_seconds': classifier_seconds,
+        }
+        with self._stats_lock:
+            for name, value in run_stats.items():
+                self.stats[name] += value
+            run_stats['ocr_seconds_saved'] = self._seconds_saved(skipped_non_text, classifier_seconds)
+        
+        if skipped_non_text:
+            logger.info(f"Text classifier skipped {skipped_non_text} non-text images "
+                        f"(~{run_stats['ocr_seconds_saved']:.1f}s of OCR saved)")
+        if stats is not None:
+            stats.update(run_stats)
+    
+    def _seconds_saved(self, skipped: int, classifier_seconds: float) -> float:
+        """Net OCR time saved by skipping images, at this processor's average OCR time per image"""
+        if not self.stats['ocr_calls']:
+            return 0.0
+        average = self.stats['ocr_seconds'] / self.stats['ocr_calls']
+        return max(0.0, skipped * average - classifier_seconds)
+    
+    def ocr_seconds_saved(self) -> float:
+        """
+        Estimate the OCR time the text classifier has saved so far, net of
+        the time spent classifying images
+        """
+        with self._stats_lock:
+            return self._seconds_saved(self.stats['skipped_non_text'], self.stats['classifier_seconds'])
+
+
+_processors = {}
+_processors_lock = threading.Lock()
+
+
+def get_ocr_processor(lang: str = None, ocr_config: str = None) -> OCRProcessor:
+    """
+    Return the process-wide OCRProcessor for the given settings
+    
+    Processors are created on first use and then reused for every document,
+    so the engine, cache and Tesseract probe are set up once per worker.
+    
+    Args:
+        lang: Language code for OCR (default: config.OCR_LANG)
+        ocr_config: Tesseract configuration string (default: config.OCR_CONFIG)
+    """
+    key = (lang or config.OCR_LANG, ocr_config or config.OCR_CONFIG)
+    with _processors_lock:
+        processor = _processors.get(key)
+        if processor is None:
+            processor = _processors[key] = OCRProcessor(lang=key[0], ocr_config=key[1])
+        return processor
+
+
+def warm_up(lang: str = None) -> List[str]:
+    """
+    Probe Tesseract and its installed languages and create the default processor
+    
+    gunicorn calls this in the master process before forking the workers
+    (preload_app in gunicorn.conf.py), so every worker inherits the probed
+    engine, the processor and the loaded modules copy-on-write instead of
+    setting them up on its first request.
+    
+    Returns:
+        Installed language codes
+    """
+    processor = get_ocr_processor(lang=lang)
+    languages = processor.engine.languages()
+    logger.info(f"Tesseract {processor.engine.version()} ready; installed languages: {', '.join(languages)}")
+    return languages
@@ -0,0 +1,15 @@
+"""
+Helpers for state shared between processes on the same host
+"""
+import os
+
+
+def pid_alive(pid: int) -> bool:
+    """Check whether a process with the given pid exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
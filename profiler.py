@@ -0,0 +1,265 @@
+"""
+Per-document performance reports (--profile)
+
+A DocumentProfile collects, for one document, a row per image (dimensions,
+decode, preprocessing and OCR milliseconds, characters extracted) and the
+time spent in each stage (extract, ocr, reconstruct, save), together with
+memory use. The document's own peak is sampled while it is processed (so
+later documents of a batch don't all report the batch's largest peak);
+the process's and the Tesseract subprocesses' lifetime peaks are reported
+next to it. Optionally the whole run is recorded with cProfile.
+
+Reports are written as JSON (for tooling) and as a self-contained HTML page
+(for reading), next to the output document.
+"""
+import cProfile
+import html
+import io
+import json
+import logging
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds between resident memory samples while a document is profiled
+RSS_SAMPLE_INTERVAL = 0.02
+
+
+def lifetime_peak_rss_mb() -> Dict[str, Optional[float]]:
+    """
+    Peak resident memory in MB of this process and of its largest finished
+    child (Tesseract), over the whole life of the process
+    """
+    if resource is None:
+        return {'process': None, 'children': None}
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'process': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+def current_rss_mb() -> Optional[float]:
+    """Current resident memory of this process in MB (None where /proc is not available)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class RSSSampler:
+    """Peak resident memory between start() and stop(), sampled from a background thread"""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.baseline = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.baseline = current_rss_mb()
+        if self.baseline is None:
+            return  # Not measurable on this platform
+        self.peak = self.baseline
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+
+
+class DocumentProfile:
+    """Timings and memory use of processing one document"""
+
+    def __init__(self, document: str, cprofile: bool = False):
+        """
+        Initialize the profile
+
+        Args:
+            document: Name or path of the document, for the report
+            cprofile: Also record a cProfile of the run
+        """
+        self.document = str(document)
+        self.images: List[Dict] = []
+        self.stages: Dict[str, float] = {}
+        self.wall_seconds = 0.0
+        self.memory_mb = {}
+        self._profiler = cProfile.Profile() if cprofile else None
+
+    def add_image(self, record: Dict):
+        """Add a record from OCRProcessor.iter_text_from_images"""
+        if record['skipped']:
+            status = f"skipped ({record['skip_reason']})"
+        elif record['failed']:
+            status = 'failed'
+        elif record['resumed']:
+            status = 'resumed'
+        elif record['cached']:
+            status = 'cached'
+        elif record['duplicate']:
+            status = 'duplicate'
+        else:
+            status = 'ocr'
+        self.images.append({
+            'image_id': record['image_id'],
+            'width': record['width'],
+            'height': record['height'],
+            'decode_ms': record['decode_ms'],
+            'preprocess_ms': record['prepare_ms'],
+            'ocr_ms': record['ocr_ms'],
+            'chars': len(record['text']),
+            'status': status,
+        })
+
+    @contextmanager
+    def capture(self):
+        """Record wall time, peak memory and (if enabled) a cProfile of the enclosed block"""
+        sampler = RSSSampler()
+        sampler.start()
+        start = time.perf_counter()
+        if self._profiler is not None:
+            self._profiler.enable()
+        try:
+            yield self
+        finally:
+            if self._profiler is not None:
+                self._profiler.disable()
+            self.wall_seconds = time.perf_counter() - start
+            sampler.stop()
+            lifetime = lifetime_peak_rss_mb()
+            # The sampled peak includes anything else the process did meanwhile (e.g. other requests)
+            self.memory_mb = {
+                'baseline': sampler.baseline,
+                'document_peak': sampler.peak,
+                'document_increase': (sampler.peak - sampler.baseline
+                                      if sampler.peak is not None else None),
+                'process_lifetime_peak': lifetime['process'],
+                'tesseract_lifetime_peak': lifetime['children'],
+            }
+
+    def top_functions(self, limit: int = 30) -> str:
+        """The cProfile functions with the most cumulative time, as text"""
+        if self._profiler is None:
+            return ''
+        buffer = io.StringIO()
+        pstats.Stats(self._profiler, stream=buffer).sort_stats('cumulative').print_stats(limit)
+        return buffer.getvalue()
+
+    def to_dict(self) -> Dict:
+        """The report as a JSON-serializable dictionary"""
+        totals = {name: round(sum(image[name] for image in self.images), 1)
+                  for name in ('decode_ms', 'preprocess_ms', 'ocr_ms')}
+        return {
+            'document': self.document,
+            'python': platform.python_version(),
+            'wall_seconds': round(self.wall_seconds, 3),
+            'stages': {stage: round(seconds, 3) for stage, seconds in self.stages.items()},
+            'image_totals': totals,
+            'memory_mb': {name: round(value, 1) if value is not None else None
+                          for name, value in self.memory_mb.items()},
+            'images': self.images,
+        }
+
+    def to_html(self) -> str:
+        """The report as a self-contained HTML page"""
+        report = self.to_dict()
+        escape = html.escape
+
+        stage_rows = "".join(
+            f"<tr><td>{escape(stage)}</td><td>{seconds:.3f}</td>"
+            f"<td>{seconds / report['wall_seconds'] * 100 if report['wall_seconds'] else 0:.0f}%</td></tr>"
+            for stage, seconds in report['stages'].items())
+        columns = ('image_id', 'width', 'height', 'decode_ms', 'preprocess_ms', 'ocr_ms', 'chars', 'status')
+        # Slowest images first: they are what the report is read for
+        images = sorted(report['images'], key=lambda image: -(image['decode_ms'] + image['preprocess_ms']
+                                                                + image['ocr_ms']))
+        image_rows = "".join(
+            "<tr>" + "".join(f"<td>{escape(str(image[column]))}</td>" for column in columns) + "</tr>"
+            for image in images)
+        memory = report['memory_mb']
+        if memory.get('document_peak') is not None:
+            memory_text = (f"{memory['document_peak']:.0f} MB during this document "
+                           f"(+{memory['document_increase']:.0f} MB over {memory['baseline']:.0f} MB at its start)")
+        else:
+            memory_text = "not sampled on this platform"
+        if memory.get('process_lifetime_peak') is not None:
+            memory_text += (f"; process lifetime peak {memory['process_lifetime_peak']:.0f} MB, "
+                            f"Tesseract subprocesses {memory['tesseract_lifetime_peak']:.0f} MB")
+        cprofile = (f"<h2>cProfile (top functions by cumulative time)</h2><pre>{escape(self.top_functions())}</pre>"
+                    if self._profiler is not None else "")
+
+        return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Profile: {escape(report['document'])}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 2em; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; text-align: right; }}
+th:first-child, td:first-child {{ text-align: left; }}
+th {{ background: #eee; }}
+</style>
+</head>
+<body>
+<h1>{escape(report['document'])}</h1>
+<p>Total time: {report['wall_seconds']:.2f}s &middot; {len(report['images'])} images &middot;
+peak memory: {memory_text}</p>
+<h2>Stages</h2>
+<table><tr><th>stage</th><th>seconds</th><th>share</th></tr>{stage_rows}</table>
+<h2>Images (slowest first)</h2>
+<p>Totals: decode {report['image_totals']['decode_ms']:.0f}ms, preprocess
+{report['image_totals']['preprocess_ms']:.0f}ms, OCR {report['image_totals']['ocr_ms']:.0f}ms</p>
+<table><tr>{"".join(f"<th>{column}</th>" for column in columns)}</tr>{image_rows}</table>
+{cprofile}
+</body>
+</html>
+"""
+
+    def write(self, output_path: str) -> List[str]:
+        """
+        Write the report next to an output document
+
+        Args:
+            output_path: The output document; the report is written as
+                         <stem>.profile.json and .html (plus .prof with cProfile)
+
+        Returns:
+            Paths of the files written
+        """
+        output = Path(output_path)
+        paths = [output.with_name(f"{output.stem}.profile.json"), output.with_name(f"{output.stem}.profile.html")]
+        paths[0].write_text(json.dumps(self.to_dict(), indent=2))
+        paths[1].write_text(self.to_html())
+        if self._profiler is not None:
+            paths.append(output.with_name(f"{output.stem}.profile.prof"))
+            self._profiler.dump_stats(str(paths[2]))
+        return [str(path) for path in paths]
@@ -0,0 +1,164 @@
+"""
+Fast text-likelihood classifier for document images
+
+Photos, chart backgrounds and decorative graphics make up a large share of the
+images in many documents, and a full Tesseract pass over them returns nothing.
+This module scores how likely an image is to contain text from a small
+grayscale thumbnail using a few vectorized NumPy features, so that clear
+non-text images can be skipped before OCR:
+
+- edge density: text produces many sharp, high-contrast edges
+- ink coverage and background dominance: text is a small amount of ink on a
+  mostly uniform background (measured against the background level of each
+  small block, so uneven lighting from a phone scan doesn't hide the text)
+- horizontal projection profile: lines of text alternate with blank gaps
+- stroke widths: many ink runs across a row are short and of similar length
+
+The score is deliberately conservative; an image is only skipped when it
+clearly lacks the structure of printed text.
+"""
+import logging
+from typing import Dict
+
+import numpy as np
+from PIL import Image
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def _ramp(value: float, low: float, high: float) -> float:
+    """Map value linearly from [low, high] to [0, 1], clipping outside the range"""
+    return float(np.clip((value - low) / (high - low), 0.0, 1.0))
+
+
+def local_background(pixels: np.ndarray, block: int = None) -> np.ndarray:
+    """
+    Background level around each pixel: the median of its block
+
+    Text covers well under half of any block, so the median is the paper
+    level even where lighting makes it drift across the page.
+
+    Args:
+        pixels: 2-D grayscale array
+        block: Block side length in pixels (default: config.TEXT_CLASSIFIER_BLOCK)
+
+    Returns:
+        Array of the same shape as pixels
+    """
+    block = block or config.TEXT_CLASSIFIER_BLOCK
+    height, width = pixels.shape
+    rows, cols = -(-height // block), -(-width // block)
+    padded = np.pad(pixels, ((0, rows * block - height), (0, cols * block - width)), mode='edge')
+    medians = np.median(padded.reshape(rows, block, cols, block), axis=(1, 3))
+    return np.repeat(np.repeat(medians, block, axis=0), block, axis=1)[:height, :width]
+
+
+def text_features(image: Image.Image, max_side: int = None) -> Dict[str, float]:
+    """
+    Compute the classifier features of an image
+
+    Args:
+        image: PIL Image object
+        max_side: Longest side of the thumbnail the features are computed on
+                  (default: config.TEXT_CLASSIFIER_MAX_SIDE)
+
+    Returns:
+        Dictionary with edge_density, ink_fraction, background_fraction,
+        profile_variation, thin_stroke_fraction and stroke_variation
+    """
+    max_side = max_side or config.TEXT_CLASSIFIER_MAX_SIDE
+
+    thumbnail = image.convert('L')
+    if max(thumbnail.size) > max_side:
+        thumbnail.thumbnail((max_side, max_side), Image.BILINEAR)
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+
+    # Edge density: strong horizontal or vertical brightness steps
+    delta = config.TEXT_CLASSIFIER_EDGE_DELTA
+    edges_x = np.abs(np.diff(pixels, axis=1)) > delta
+    edges_y = np.abs(np.diff(pixels, axis=0)) > delta
+    edge_density = (edges_x.mean() + edges_y.mean()) / 2 if edges_x.size and edges_y.size else 0.0
+
+    # Background dominance: share of pixels at (nearly) their block's background level
+    deviation = np.abs(pixels - local_background(pixels))
+    background_fraction = (deviation <= config.TEXT_CLASSIFIER_BACKGROUND_BAND).mean()
+
+    # Ink: anything that clearly differs from the local background, dark or light
+    ink = deviation > delta
+    ink_fraction = ink.mean()
+
+    # Projection profile: ink per row varies strongly between text lines and gaps
+    row_profile = ink.sum(axis=1).astype(np.float64)
+    profile_mean = row_profile.mean()
+    profile_variation = row_profile.std() / profile_mean if profile_mean > 0 else 0.0
+
+    # Stroke widths: lengths of horizontal ink runs, found from run boundaries
+    padded = np.zeros((ink.shape[0], ink.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = ink
+    boundaries = np.diff(padded, axis=1)
+    starts = np.flatnonzero(boundaries == 1)
+    ends = np.flatnonzero(boundaries == -1)
+    if starts.size:
+        run_lengths = (ends - starts).astype(np.float64)
+        thin = run_lengths <= config.TEXT_CLASSIFIER_MAX_STROKE
+        thin_stroke_fraction = thin.mean()
+        # Variation among the thin runs only, so bars and shapes next to text don't mask it
+        thin_runs = run_lengths[thin]
+        stroke_variation = thin_runs.std() / thin_runs.mean() if thin_runs.size else 0.0
+    else:
+        thin_stroke_fraction = 0.0
+        stroke_variation = 0.0
+
+    return {
+        'edge_density': float(edge_density),
+        'ink_fraction': float(ink_fraction),
+        'background_fraction': float(background_fraction),
+        'profile_variation': float(profile_variation),
+        'thin_stroke_fraction': float(thin_stroke_fraction),
+        'stroke_variation': float(stroke_variation),
+    }
+
+
+def text_likelihood(image: Image.Image, max_side: int = None) -> float:
+    """
+    Score how likely an image is to contain text
+
+    Args:
+        image: PIL Image object
+        max_side: Longest side of the thumbnail (default: config.TEXT_CLASSIFIER_MAX_SIDE)
+
+    Returns:
+        Score between 0 (no text) and 1 (looks like printed text)
+    """
+    features = text_features(image, max_side)
+
+    # Text needs some sharp edges, but not the dense noise of a texture
+    edge_score = (_ramp(features['edge_density'], 0.002, 0.02) *
+                  (1.0 - _ramp(features['edge_density'], 0.35, 0.6)))
+    # Photos and filled shapes cover most of the image with "ink"
+    ink_score = 1.0 - _ramp(features['ink_fraction'], 0.4, 0.6)
+    # A fair share of thin strokes of consistent width
+    stroke_score = (_ramp(features['thin_stroke_fraction'], 0.05, 0.25) *
+                    (1.0 - _ramp(features['stroke_variation'], 0.8, 1.2)))
+
+    # Either a clean background or a line structure is enough to keep the image
+    background_score = _ramp(features['background_fraction'], 0.2, 0.5)
+    profile_score = _ramp(features['profile_variation'], 0.2, 0.6)
+    layout_score = max(background_score, profile_score)
+
+    return edge_score * ink_score * stroke_score * layout_score
+
+
+def is_likely_text(image: Image.Image, threshold: float = None) -> bool:
+    """
+    Check whether an image is worth running OCR on
+
+    Args:
+        image: PIL Image object
+        threshold: Minimum text_likelihood score (default: config.TEXT_CLASSIFIER_THRESHOLD)
+    """
+    if threshold is None:
+        threshold = config.TEXT_CLASSIFIER_THRESHOLD
+    return text_likelihood(image) >= threshold
@@ -0,0 +1,79 @@
+"""
+Text-only output: the OCR text of a document's images without rebuilding the document
+
+For consumers that only index the text, writing a .docx means loading the
+python-docx object model, inserting paragraphs and serializing the whole
+package. The text formats skip all of that and list each image's text with
+its position, in document order:
+
+- json: one object with the document name and a list of images
+- jsonl: one image per line
+- txt: each image's text under a line naming the image and its position
+"""
+import json
+from pathlib import Path
+from typing import Dict, List
+
+DOCX = 'docx'
+TEXT_FORMATS = ('json', 'jsonl', 'txt')
+FORMATS = (DOCX,) + TEXT_FORMATS
+
+MIMETYPES = {
+    'json': 'application/json',
+    'jsonl': 'application/x-ndjson',
+    'txt': 'text/plain; charset=utf-8',
+}
+
+
+def image_entries(images: List, image_texts: Dict[str, str]) -> List[Dict]:
+    """
+    Positions and text of the images that have text results
+
+    Args:
+        images: ImageInfo records in document order
+        image_texts: Text by image id (images skipped before OCR are absent)
+    """
+    return [{
+        'image_id': image.image_id,
+        'part': image.part_name,
+        'paragraph_index': image.paragraph_index,
+        'run_index': image.run_index,
+        'text': image_texts[image.image_id],
+    } for image in images if image.image_id in image_texts]
+
+
+def render(output_format: str, document_name: str, entries: List[Dict]) -> str:
+    """
+    Format the image entries of a document
+
+    Args:
+        output_format: One of TEXT_FORMATS
+        document_name: Name of the source document, recorded in the output
+        entries: From image_entries()
+    """
+    if output_format == 'json':
+        return json.dumps({'document': document_name, 'images': entries}, ensure_ascii=False, indent=2) + '\n'
+    if output_format == 'jsonl':
+        return ''.join(json.dumps(dict(entry, document=document_name), ensure_ascii=False) + '\n'
+                       for entry in entries)
+    if output_format == 'txt':
+        return ''.join(f"[{entry['image_id']}: {entry['part']} paragraph {entry['paragraph_index']}, "
+                       f"run {entry['run_index']}]\n{entry['text']}\n\n" for entry in entries)
+    raise ValueError(f"Unknown text format '{output_format}'. Choose from: {', '.join(TEXT_FORMATS)}")
+
+
+def write(output, output_format: str, document_name: str, entries: List[Dict]):
+    """
+    Write the text output to a path or a binary file object
+
+    Args:
+        output: Path of the file to write, or a writable binary file
+        output_format: One of TEXT_FORMATS
+        document_name: Name of the source document
+        entries: From image_entries()
+    """
+    data = render(output_format, document_name, entries).encode('utf-8')
+    if isinstance(output, (str, Path)):
+        Path(output).write_bytes(data)
+    else:
+        output.write(data)